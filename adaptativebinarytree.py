@@ -1,167 +1,489 @@
+import sys
+import struct
 import numpy as np
-from operator import attrgetter
 
+from collections import deque
 
-class Node():
-
-    def __init__(self, symbol, weight, number, bitstream=None):
-        self.symbol = symbol
-        self.weight = weight
-        self.number = number
-        self.bitstream = bitstream
 
+# NOTE: Update algorithms. FGK swaps each node on the path with the leader of its weight block. Vitter's
+# algorithm Lambda also keeps leaves ahead of internal nodes of the same weight, which minimizes the height
+# of the tree among the Huffman trees of its weights and bounds the moves of each update.
+TREE_ALGORITHMS = ('fgk', 'vitter')
 
 
 class AdaptativeBinaryTree():
 
-    def __init__(self, code_length):
-        self.root_node_number = 2 * code_length - 1
-        root_node = Node("NYT", 0, self.root_node_number)
-        self.nodes = np.array([root_node])
-        self.last_searched_index = 0
+    # NOTE: Serialized state header: NYT node number (I) and leaf weights item size in bytes (B).
+    STATE_STRUCT = struct.Struct('<IB')
+    # NOTE: In serialized states, leaves hold their symbol with this flag, internal nodes hold their left child.
+    LEAF_FLAG = 0x8000
+
+    def __init__(self, code_length, algorithm='fgk'):
+        if algorithm not in TREE_ALGORITHMS:
+            raise ValueError(f"Unknown tree algorithm: {algorithm}.")
+        self.algorithm = algorithm
+
+        # NOTE: Every node is stored in flat integer arrays indexed by its node number.
+        # The sibling property holds when weights are non-decreasing along the node numbers.
+        # With a NYT node always present, the tree can hold up to 2 * code_length + 1 nodes.
+        self.root_node_number = 2 * code_length
+        nodes_amount = self.root_node_number + 1
+
+        self.parent = np.full(nodes_amount, -1, dtype=np.int64)
+        self.left_child = np.full(nodes_amount, -1, dtype=np.int64)
+        self.right_child = np.full(nodes_amount, -1, dtype=np.int64)
+        self.weight = np.zeros(nodes_amount, dtype=np.int64)
+        # NOTE: Internal nodes and the NYT node hold -1 as symbol.
+        self.symbol = np.full(nodes_amount, -1, dtype=np.int64)
+        # NOTE: Symbol to leaf index. Node numbers are already the array indexes,
+        # so both directions of the lookup cost O(1).
+        self.symbol_leaf = np.full(code_length, -1, dtype=np.int64)
+
+        ##### The tree starts with the NYT node as root.
+        self.nyt_node = self.root_node_number
+        # NOTE: Incremented whenever a swap moves a subtree, so decoding tables know when they are stale.
+        self.structure_version = 0
+
+        ##### Optional instrumentation, see set_stats, and aging policy, see set_aging.
+        self.set_stats(None)
+        self.set_aging()
 
 
     def insert_symbol(self, symbol):
-        if len(self.nodes) == 1:
-            self.insert_first_symbol(symbol)
-
+        if self.algorithm == 'vitter':
+            self.__insert_symbol_vitter(symbol)
         else:
-            node = next((node for node in self.nodes if node.symbol == symbol), None)
-            if node is None:
-                self.insert_new_symbol(symbol)
+            leaf_node = self.get_symbol_node(symbol)
+            if leaf_node is None:
+                node = self.insert_new_symbol(symbol)
             else:
-                self.update_existing_symbol(node)
-                self.sibling_property()
+                node = leaf_node
+
+            ##### Walk from the updated node to the root, keeping the sibling property.
+            # NOTE: Only the weights along this path change, one increment per node. Swapped nodes have the same
+            # weight, so no weight around them has to be recomputed and each symbol costs O(depth) steps.
+            while True:
+                node = self.swap_with_block_leader(node)
+                self.weight[node] += 1
+                if node == self.root_node_number:
+                    break
+                node = self.parent[node]
+
+        if self.aging:
+            self.age_weights()
+
+
+    def set_aging(self, rescale_interval=None, max_weight=None):
+        # NOTE: Weights are halved every rescale_interval symbols and whenever the root weight reaches max_weight,
+        # so old statistics fade away and weights stay below max_weight.
+        # Halved weights sum up to at most (max_weight + code_length) / 2, so max_weight must be large enough
+        # for the root weight to drop below it.
+        if max_weight is not None and max_weight <= 2 * len(self.symbol_leaf):
+            raise ValueError(f"The maximum weight must be greater than {2 * len(self.symbol_leaf)}.")
+        self.rescale_interval = rescale_interval
+        self.max_weight = max_weight
+        self.aging = bool(rescale_interval or max_weight)
+        # NOTE: Symbols coded since the tree was created. Trees restored from a checkpoint must have it set back.
+        self.coded_symbols = 0
+
+
+    def age_weights(self, symbols_amount=1):
+        ##### Count coded symbols and rescale once the policy says so.
+        # NOTE: Compiled kernels do not rescale, callers stop them at get_symbols_before_rescale symbols instead.
+        self.coded_symbols += symbols_amount
+        if (self.rescale_interval and self.coded_symbols % self.rescale_interval == 0) or \
+           (self.max_weight and self.weight[self.root_node_number] >= self.max_weight):
+            self.rescale_weights()
+
+
+    def get_symbols_before_rescale(self):
+        ##### Amount of symbols up to the next rescale, included. Each symbol adds one to the root weight.
+        symbols_amount = sys.maxsize
+        if self.rescale_interval:
+            symbols_amount = self.rescale_interval - self.coded_symbols % self.rescale_interval
+        if self.max_weight:
+            symbols_amount = min(symbols_amount, self.max_weight - int(self.weight[self.root_node_number]))
+        return symbols_amount
+
+
+    def set_stats(self, stats):
+        # NOTE: Counting versions of the update methods shadow the plain ones only while stats are set,
+        # so the tree runs the exact same code as before when they are disabled.
+        self.stats = stats
+        if stats is None:
+            self.__dict__.pop('insert_symbol', None)
+            self.__dict__.pop('swap_nodes', None)
+            self.__dict__.pop('slide_node', None)
+        else:
+            self.insert_symbol = self.__insert_symbol_with_stats
+            self.swap_nodes = self.__swap_nodes_with_stats
+            self.slide_node = self.__slide_node_with_stats
+
+
+    def get_symbol_node(self, symbol):
+        leaf_node = self.symbol_leaf[symbol]
+        return leaf_node if leaf_node >= 0 else None
 
-            self.update_weights()
-            nodes_replaced = self.sibling_property()
-            while nodes_replaced:
-                self.update_weights()
-                nodes_replaced = self.sibling_property()
-            #self.update_weights() if self.sibling_property() else None
 
-    
     def get_symbol_codeword(self, symbol):
-        node = next((node for node in self.nodes if node.symbol == symbol), None)
-        try:
-            return node.bitstream
-        except:
+        node = self.get_symbol_node(symbol)
+        if node is None:
             return None
+        return self.get_node_codeword(node)
 
 
     def get_codeword_for_nyt(self):
-        return self.nodes[-1].bitstream
+        return self.get_node_codeword(self.nyt_node)
+
+
+    def get_node_codeword(self, node):
+        ##### Climb parent links until reaching the root.
+        # NOTE: Codewords are (value, length) integer pairs. Right children are assigned to bit 1
+        # and left children to bit 0, the bit closest to the root being the most significant one.
+        codeword, codeword_length = 0, 0
+        while node != self.root_node_number:
+            parent = self.parent[node]
+            if self.right_child[parent] == node:
+                codeword |= 1 << codeword_length
+            codeword_length += 1
+            node = parent
+        return codeword, codeword_length
+
+
+    def get_symbol_from_codeword(self, codeword, codeword_length):
+        ##### Walk down from the root following the codeword bits.
+        node = self.root_node_number
+        for shift in range(codeword_length - 1, -1, -1):
+            node = self.right_child[node] if (codeword >> shift) & 1 else self.left_child[node]
+
+        if node == self.nyt_node:
+            return 'NYT'
+        if self.symbol[node] < 0:
+            ##### Codeword reaches an internal node, so more bits are required.
+            return None
+        return int(self.symbol[node])
+
+
+    def serialize_state(self):
+        ##### Only nodes between the NYT node and the root are in use.
+        nodes = slice(self.nyt_node + 1, self.root_node_number + 1)
+        leaves = self.left_child[nodes] < 0
+
+        # NOTE: Right children always follow their left sibling, so one link per internal node is enough.
+        links = np.where(leaves, self.symbol[nodes] | self.LEAF_FLAG, self.left_child[nodes]).astype('<u2')
+
+        # NOTE: Internal weights are recomputed on loading, leaf weights use the smallest integer type that fits.
+        leaf_weights = self.weight[nodes][leaves]
+        weights_type = np.min_scalar_type(leaf_weights.max() if len(leaf_weights) else 0).newbyteorder('<')
+
+        return self.STATE_STRUCT.pack(self.nyt_node, weights_type.itemsize) + links.tobytes() + \
+               leaf_weights.astype(weights_type).tobytes()
+
+
+    def load_state(self, state):
+        ##### Start from an empty tree, keeping its stats and aging policy.
+        stats, rescale_interval, max_weight = self.stats, self.rescale_interval, self.max_weight
+        self.__init__(len(self.symbol_leaf), self.algorithm)
+        self.set_stats(stats)
+        self.set_aging(rescale_interval, max_weight)
+        nyt_node, weights_size = self.STATE_STRUCT.unpack_from(state)
+        nodes_amount = self.root_node_number - nyt_node
+        links_end = self.STATE_STRUCT.size + 2 * nodes_amount
+        links = np.frombuffer(state[self.STATE_STRUCT.size:links_end], dtype='<u2').astype(np.int64)
+        leaf_weights = np.frombuffer(state[links_end:], dtype=f'<u{weights_size}').astype(np.int64)
+
+        ##### Restore links and leaf symbols.
+        nodes = np.arange(nyt_node + 1, self.root_node_number + 1)
+        leaves = (links & self.LEAF_FLAG) != 0
+        internal_nodes, left_children = nodes[~leaves], links[~leaves]
+        self.left_child[internal_nodes] = left_children
+        self.right_child[internal_nodes] = left_children + 1
+        self.parent[left_children] = internal_nodes
+        self.parent[left_children + 1] = internal_nodes
+        self.symbol[nodes[leaves]] = links[leaves] & ~self.LEAF_FLAG
+        self.symbol_leaf[self.symbol[nodes[leaves]]] = nodes[leaves]
+        self.weight[nodes[leaves]] = leaf_weights
+        self.nyt_node = nyt_node
+
+        ##### Children are numbered below their parents, so weights are summed in increasing order.
+        for node, left_child in zip(internal_nodes, left_children):
+            self.weight[node] = self.weight[left_child] + self.weight[left_child + 1]
+
+        ##### States of FGK trees, such as trained snapshots, may put internal nodes ahead of leaves of the same weight.
+        # NOTE: Vitter trees are then rebuilt from their leaves. States saved by Vitter trees are kept as they are.
+        if self.algorithm == 'vitter' and not self.__has_vitter_order():
+            self.rescale_weights(halve=False)
+
+
+    def build_decoding_table(self, bits_amount):
+        ##### Map every bits_amount-bit prefix to the node it reaches and to the amount of bits consumed.
+        # NOTE: Walks stop at leaves, so prefixes holding a short codeword consume only its bits.
+        table_size = 1 << bits_amount
+        table_nodes = [0] * table_size
+        table_lengths = [0] * table_size
+
+        pending_nodes = [(self.root_node_number, 0, 0)]
+        while pending_nodes:
+            node, prefix, depth = pending_nodes.pop()
+            if depth == bits_amount or self.left_child[node] < 0:
+                start = prefix << (bits_amount - depth)
+                end = (prefix + 1) << (bits_amount - depth)
+                table_nodes[start:end] = [int(node)] * (end - start)
+                table_lengths[start:end] = [depth] * (end - start)
+            else:
+                pending_nodes.append((self.left_child[node], prefix << 1, depth + 1))
+                pending_nodes.append((self.right_child[node], (prefix << 1) | 1, depth + 1))
 
+        return table_nodes, table_lengths
+
+
+    def rescale_weights(self, halve=True):
+        ##### Halve leaf weights, rounding up so that no symbol gets a zero weight.
+        nodes = np.arange(self.nyt_node + 1, self.root_node_number + 1)
+        leaves = nodes[self.left_child[nodes] < 0]
+        if len(leaves) == 0:
+            return
+        leaf_weights = (self.weight[leaves] + 1) // 2 if halve else self.weight[leaves]
+        self.__build_tree(self.symbol[leaves], leaf_weights)
 
-    def get_symbol_from_codeword(self, codeword):       
-        for node_idx in range(self.last_searched_index + 1, len(self.nodes)):
-            node = self.nodes[node_idx]
-            if node.bitstream == codeword:
-                if node.symbol is not 'IN':
-                    self.last_searched_index = 0
-                    return node.symbol
-                else:
-                    self.last_searched_index = node_idx
-                    return None
-    
-    
-    def insert_first_symbol(self, symbol):
-        self.nodes[0].symbol = "IN"
-        self.nodes[0].weight = 1
-        self.nodes = np.append(self.nodes, Node(symbol, 1, self.nodes[0].number - 1, '1'))
-        self.nodes = np.append(self.nodes, Node("NYT", 0, self.nodes[0].number - 2, '0'))
+
+    def set_symbol_weights(self, symbol_weights):
+        ##### Replace the tree by one holding every symbol with a nonzero weight, as if they had been coded already.
+        symbols = np.flatnonzero(symbol_weights)
+        self.nyt_node = self.root_node_number - 2 * len(symbols)
+        self.__build_tree(symbols, np.asarray(symbol_weights, dtype=np.int64)[symbols])
 
 
     def insert_new_symbol(self, symbol):
-        self.nodes[-1].symbol = "IN"
-        in_bitstream = self.nodes[-1].bitstream
-        in_number    = self.nodes[-1].number
-        self.nodes = np.append(self.nodes, Node(symbol, 1, in_number - 1, in_bitstream + '1'))
-        self.nodes = np.append(self.nodes, Node("NYT", 0, in_number - 2, in_bitstream + '0'))
+        ##### NYT node gives birth to a new NYT (left) and to the new symbol leaf (right).
+        internal_node = self.nyt_node
+        nyt_node, leaf_node = internal_node - 2, internal_node - 1
+
+        self.left_child[internal_node] = nyt_node
+        self.right_child[internal_node] = leaf_node
+        self.parent[nyt_node] = internal_node
+        self.parent[leaf_node] = internal_node
 
+        self.symbol[leaf_node] = symbol
+        self.symbol_leaf[symbol] = leaf_node
+        self.weight[leaf_node] = 1
+        self.nyt_node = nyt_node
 
-    def update_existing_symbol(self, node):
-        node_index = np.where(self.nodes == node)[0][0]
-        self.nodes[node_index].weight += 1
+        ##### The former NYT node is the first one whose weight must be incremented.
+        return internal_node
 
 
-    def sibling_property(self):
-        node_with_smallest_weight = self.nodes[1]
-        node_with_greater_weight = None
-        nodes_to_be_replaced = []
+    def swap_with_block_leader(self, node):
+        if node == self.root_node_number:
+            return node
 
-        for node in self.nodes[2:-1]:
-            if node.weight < node_with_smallest_weight.weight:
-                node_with_smallest_weight = node
-            elif node.weight > node_with_smallest_weight.weight:
-                node_with_greater_weight = node
-                if not node_with_greater_weight.bitstream.startswith(node_with_smallest_weight.bitstream):
-                    nodes_to_be_replaced = [node_with_smallest_weight, node_with_greater_weight]
+        ##### Find the highest numbered node with the same weight.
+        # NOTE: Weights from the current node up to the root are sorted, so a binary search suffices.
+        weight = self.weight[node]
+        block_leader = node + np.searchsorted(self.weight[node:], weight, side='right') - 1
+
+        # NOTE: A node is never swapped with its own parent.
+        if block_leader == node or block_leader == self.parent[node]:
+            return node
 
-        if nodes_to_be_replaced != []:
-            self.vectorized_prefix_replacing(nodes_to_be_replaced[0].bitstream, nodes_to_be_replaced[1].bitstream)
-            self.correct_node_numbers()
-            ##### Return True to sinalize that a new weight update is required
-            return True
-        
-        return False
+        self.swap_nodes(node, block_leader)
+        return block_leader
 
 
-    def update_weights(self):
-        longest_codeword = len(self.nodes[-1].bitstream)
-        next_level_indexes = np.where(np.vectorize(self.filter_nodes_by_bs_length)(self.nodes, longest_codeword) == True)[0]
+    def swap_with_leaf_leader(self, node):
+        ##### Find the highest numbered leaf with the same weight, leaves being ahead of internal nodes of their weight.
+        # NOTE: Most leaves already lead their block, which is checked on the next node before any search.
+        weight = self.weight[node]
+        if node == self.root_node_number or self.weight[node + 1] != weight or self.left_child[node + 1] >= 0:
+            return node
+        block_end = node + self.weight[node:].searchsorted(weight, side='right')
+        leaf_leader = node + (self.left_child[node:block_end] >= 0).searchsorted(True) - 1
+        self.swap_nodes(node, leaf_leader)
+        return leaf_leader
+
+
+    def slide_node(self, node, last_node):
+        ##### Move the content of node to last_node, the contents of the nodes in between moving one number down.
+        # NOTE: As in swaps, numbers keep their position in the tree, so subtrees move along with their root.
+        # NOTE: Slid ranges are short, so they are shifted with slice copies and fixed up one node at a time.
+        for attribute in (self.left_child, self.right_child, self.symbol, self.weight):
+            content = attribute[node]
+            attribute[node:last_node] = attribute[node + 1:last_node + 1]
+            attribute[last_node] = content
+
+        ##### Children of moved nodes must point to their new parents, and moved leaves be found at their new number.
+        moved_internal_node = False
+        left_children = self.left_child[node:last_node + 1].tolist()
+        for number, (left_child, symbol) in enumerate(zip(left_children, self.symbol[node:last_node + 1].tolist()),
+                                                      node):
+            if left_child >= 0:
+                self.parent[left_child] = self.parent[left_child + 1] = number
+                moved_internal_node = True
+            elif symbol >= 0:
+                self.symbol_leaf[symbol] = number
+        if moved_internal_node:
+            self.structure_version += 1
+
+
+    def swap_nodes(self, first_node, second_node):
+        ##### Exchange node contents, keeping each number attached to its position in the tree.
+        for attribute in (self.left_child, self.right_child, self.symbol):
+            attribute[first_node], attribute[second_node] = attribute[second_node], attribute[first_node]
+
+        # NOTE: Swapping two leaves keeps every path from the root, only internal nodes reshape the tree.
+        if self.left_child[first_node] >= 0 or self.left_child[second_node] >= 0:
+            self.structure_version += 1
+
+        ##### Children of the swapped nodes must point to their new parents.
+        for node in (first_node, second_node):
+            if self.left_child[node] >= 0:
+                self.parent[self.left_child[node]] = node
+                self.parent[self.right_child[node]] = node
+            ##### Moved leaves must be found at their new number.
+            elif self.symbol[node] >= 0:
+                self.symbol_leaf[self.symbol[node]] = node
+
+
+    ########## Private Methods
+    def __insert_symbol_vitter(self, symbol):
+        ##### Walk from the updated node to the root, sliding each node past the block that follows its own.
+        # NOTE: Returns the amount of steps. A new symbol starts the walk from the former NYT node, with its leaf
+        # already holding weight one, since no internal node of weight zero is left for it to slide past.
+        leaf_to_increment = None
+        node = self.get_symbol_node(symbol)
+        if node is None:
+            node = self.insert_new_symbol(symbol)
+        else:
+            node = self.swap_with_leaf_leader(node)
+            ##### The sibling of the NYT node weighs as much as its parent, so it is incremented after it.
+            if node == self.nyt_node + 1:
+                leaf_to_increment = node
+                node = self.parent[node]
+
+        steps = 0
+        while node >= 0:
+            node = self.__slide_and_increment(node)
+            steps += 1
+        if leaf_to_increment is not None:
+            self.__slide_and_increment(leaf_to_increment)
+            steps += 1
+        return steps
+
+
+    def __slide_and_increment(self, node):
+        ##### Leaves slide past the internal nodes of their weight, internal nodes past the leaves of the next weight.
+        # NOTE: Returns the next node of the walk, the new parent of a leaf or the former parent of an internal node.
+        # NOTE: Blocks are searched only when the next node belongs to them, which most steps skip.
+        if node == self.root_node_number:
+            self.weight[node] += 1
+            return -1
+        weight = self.weight[node]
+        is_leaf = self.left_child[node] < 0
+        former_parent = self.parent[node]
+        last_node = node
+        if self.weight[node + 1] == weight:
+            last_node = node + self.weight[node:].searchsorted(weight, side='right') - 1
+        block_start = last_node + 1
+        if not is_leaf and block_start <= self.root_node_number and self.weight[block_start] == weight + 1 and \
+           self.left_child[block_start] < 0:
+            block_end = block_start + self.weight[block_start:].searchsorted(weight + 1, side='right')
+            last_node = block_start + (self.left_child[block_start:block_end] >= 0).searchsorted(True) - 1
+
+        if last_node > node:
+            self.slide_node(node, last_node)
+            ##### The former parent moved one number down if it was slid past.
+            if node < former_parent <= last_node:
+                former_parent -= 1
+        self.weight[last_node] += 1
+        return self.parent[last_node] if is_leaf else former_parent
+
+
+    def __has_vitter_order(self):
+        nodes = slice(self.nyt_node + 1, self.root_node_number + 1)
+        is_internal = self.left_child[nodes] >= 0
+        same_weight = self.weight[nodes][:-1] == self.weight[nodes][1:]
+        return not np.any(same_weight & is_internal[:-1] & ~is_internal[1:])
+
+
+    def __build_tree(self, leaf_symbols, leaf_weights):
+        ##### Build the tree with the two-queue Huffman method, numbering nodes in the order they are merged.
+        # NOTE: Merged weights never decrease, so numbering them upwards from the NYT node restores the sibling
+        # property. Siblings are merged one after the other, so right children still follow their left sibling.
+        # On ties, merged nodes come first, so the parent of the NYT node never leads the block of its sibling.
+        # Vitter trees take leaves first instead, keeping them ahead of the internal nodes of the same weight.
+        order = np.argsort(leaf_weights, kind='stable')
+        leaf_queue = deque([(0, -1)] + [(int(leaf_weights[index]), int(leaf_symbols[index])) for index in order])
+        merged_queue = deque()
+        for attribute in (self.parent, self.left_child, self.right_child, self.symbol, self.symbol_leaf):
+            attribute[:] = -1
+        self.weight[:] = 0
+        self.structure_version += 1
+        if len(leaf_queue) == 1:
+            return
 
-        for current_level in range(longest_codeword - 1, 0, -1):
-            current_level_indexes = np.where(np.vectorize(self.filter_nodes_by_bs_length)(self.nodes, current_level) == True)[0]
+        next_node = self.nyt_node
+        while len(leaf_queue) + len(merged_queue) > 1:
+            children = []
+            for _ in range(2):
+                if merged_queue and (not leaf_queue or merged_queue[0][0] < leaf_queue[0][0] or
+                                     (merged_queue[0][0] == leaf_queue[0][0] and self.algorithm == 'fgk')):
+                    weight, (left_child, right_child) = merged_queue.popleft()
+                    self.__place_internal_node(next_node, weight, left_child, right_child)
+                else:
+                    weight, symbol = leaf_queue.popleft()
+                    self.__place_leaf(next_node, weight, symbol)
+                children.append(next_node)
+                next_node += 1
+            merged_queue.append((int(self.weight[children[0]] + self.weight[children[1]]), tuple(children)))
 
-            next_level_nodes = self.nodes[next_level_indexes]
-            next_level_bitstreams = np.array(list(map(lambda node: node.bitstream, next_level_nodes)))
-            next_level_weights = np.array(list(map(lambda node: node.weight, next_level_nodes)))
+        weight, (left_child, right_child) = merged_queue.popleft()
+        self.__place_internal_node(self.root_node_number, weight, left_child, right_child)
 
-            list(map(lambda index: self.update_weight_of_given_node(index, next_level_bitstreams, next_level_weights), current_level_indexes))
 
-            next_level_indexes = current_level_indexes
+    def __place_leaf(self, node, weight, symbol):
+        self.weight[node] = weight
+        if symbol >= 0:
+            self.symbol[node] = symbol
+            self.symbol_leaf[symbol] = node
 
-        self.nodes[0].weight = np.sum((self.nodes[1].weight, self.nodes[2].weight))
 
+    def __place_internal_node(self, node, weight, left_child, right_child):
+        self.weight[node] = weight
+        self.left_child[node], self.right_child[node] = left_child, right_child
+        self.parent[left_child], self.parent[right_child] = node, node
 
-    def filter_nodes_by_bs_length(self, node, bs_length):
-        try:
-            return True if len(node.bitstream) == bs_length else False
-        except:
-            return False
 
-    
-    def update_weight_of_given_node(self, node_index, next_level_bitstreams, next_level_weights):
-        if self.nodes[node_index].symbol not in ["IN", "NYT"]:
+    def __insert_symbol_with_stats(self, symbol):
+        ##### Same walk as insert_symbol, counting its steps.
+        if self.algorithm == 'vitter':
+            self.stats.update_steps += self.__insert_symbol_vitter(symbol)
+            if self.aging:
+                self.age_weights()
             return
-        prefix = self.nodes[node_index].bitstream
-        prefix_indexes = list(map(lambda bitstream: bitstream.startswith(prefix), next_level_bitstreams))
-        offsprings_weights = next_level_weights[prefix_indexes]
-        self.nodes[node_index].weight = np.sum(offsprings_weights)
 
+        node = self.get_symbol_node(symbol)
+        if node is None:
+            node = self.insert_new_symbol(symbol)
 
-    def vectorized_prefix_replacing(self, bs_1, bs_2):
-        vect_func = np.vectorize(self.replace_prefixes)
-        self.nodes = vect_func(self.nodes, bs_1, bs_2)
+        while True:
+            self.stats.update_steps += 1
+            node = self.swap_with_block_leader(node)
+            self.weight[node] += 1
+            if node == self.root_node_number:
+                break
+            node = self.parent[node]
 
-    
-    def replace_prefixes(self, node, bs_1, bs_2):
-        if node.bitstream is None:
-            return node
-        if node.bitstream.startswith(bs_1):
-            node.bitstream = node.bitstream.replace(bs_1, bs_2, 1)
-        elif node.bitstream.startswith(bs_2):
-            node.bitstream = node.bitstream.replace(bs_2, bs_1, 1)
-        return node
+        if self.aging:
+            self.age_weights()
 
 
-    def correct_node_numbers(self):
-        self.nodes[1:] = np.array(sorted(self.nodes[1:], key=lambda node: (len(node.bitstream), -int(node.bitstream, base=2))))
-        numbers_list = np.arange(self.root_node_number - 1, self.root_node_number - 1 - len(self.nodes[1:]), -1)
-        self.nodes[1:] = np.vectorize(self.assign_number)(self.nodes[1:], numbers_list)
+    def __swap_nodes_with_stats(self, first_node, second_node):
+        AdaptativeBinaryTree.swap_nodes(self, first_node, second_node)
+        is_internal = self.left_child[first_node] >= 0 or self.left_child[second_node] >= 0
+        self.stats.record_swap(first_node, second_node, bool(is_internal))
 
 
-    def assign_number(self, node, new_number):
-        node.number = new_number
-        return node
\ No newline at end of file
+    def __slide_node_with_stats(self, node, last_node):
+        AdaptativeBinaryTree.slide_node(self, node, last_node)
+        is_internal = np.any(self.left_child[node:last_node + 1] >= 0)
+        self.stats.record_swap(node, last_node, bool(is_internal))
@@ -0,0 +1,288 @@
+import struct
+
+
+class BinaryContainerHeader():
+
+    # NOTE: Fixed-size header layout (little-endian):
+    # magic (4s), version (B), flags (H), padding bits (B), channels (B), original length (Q), height (I), width (I).
+    # Version 1 headers, with 8-bit flags, are still read.
+    MAGIC = b'AHUF'
+    VERSION = 2
+    HEADER_STRUCTS = {1: struct.Struct('<4sBBBBQII'), 2: struct.Struct('<4sBHBBQII')}
+    VERSION_STRUCT = struct.Struct('<4sB')
+    # NOTE: Optional block table: amount of blocks (I), then, for each block,
+    # its payload offset in bytes (Q), its amount of symbols (Q) and its padding bits (B).
+    BLOCK_COUNT_STRUCT = struct.Struct('<I')
+    BLOCK_STRUCT = struct.Struct('<QQB')
+    # NOTE: Optional planar image mode, where each block holds one channel: pixel predictor identifier (B).
+    PLANAR_STRUCT = struct.Struct('<B')
+    # NOTE: Optional context mode: context order in symbols (B) and maximum amount of live trees (I).
+    CONTEXT_STRUCT = struct.Struct('<BI')
+    # NOTE: Optional weight aging policy: rescale interval in symbols (I) and maximum root weight (I), zero if unused.
+    AGING_STRUCT = struct.Struct('<II')
+    # NOTE: Optional identifier of the tree snapshot the coding started from (I), see treesnapshots.
+    SNAPSHOT_STRUCT = struct.Struct('<I')
+    # NOTE: Optional static mode, coded with a canonical Huffman code: amount of symbols (H), then the code length
+    # of each symbol in 4 bits, two symbols per byte with the first one in the high bits.
+    STATIC_STRUCT = struct.Struct('<H')
+    # NOTE: Optional seek index position, in bytes from the beginning of the file (Q).
+    SEEK_INDEX_STRUCT = struct.Struct('<Q')
+
+    ##### Flags
+    IMAGE_FLAG = 0x01
+    BLOCKS_FLAG = 0x02
+    SEEK_INDEX_FLAG = 0x04
+    PLANAR_FLAG = 0x08
+    CONTEXT_FLAG = 0x10
+    AGING_FLAG = 0x20
+    SNAPSHOT_FLAG = 0x40
+    STATIC_FLAG = 0x80
+    VITTER_FLAG = 0x100
+
+
+    def __init__(self, original_length=0, padding_bits=0, shape=None, blocks=None, seek_index_offset=None,
+                 predictor=None, context_order=0, max_context_trees=0, rescale_interval=0, max_weight=0,
+                 snapshot_id=None, code_lengths=None, tree_algorithm='fgk', version=VERSION):
+        self.original_length = original_length
+        self.padding_bits = padding_bits
+        self.shape = tuple(shape) if shape is not None else None
+        # NOTE: List of (offset, original length, padding bits) tuples, one for each independently coded block.
+        self.blocks = blocks
+        # NOTE: The seek index is written after the payload, which then ends at this offset.
+        self.seek_index_offset = seek_index_offset
+        # NOTE: Only set in planar mode, where the blocks are the image channels coded with this predictor.
+        self.predictor = predictor
+        # NOTE: Only set in context mode, where each symbol is coded with the tree of the symbols before it.
+        self.context_order = context_order
+        self.max_context_trees = max_context_trees
+        # NOTE: Only set when tree weights are halved periodically, see AdaptativeBinaryTree.set_aging.
+        self.rescale_interval = rescale_interval
+        self.max_weight = max_weight
+        # NOTE: Only set when trees are primed with a snapshot instead of starting empty.
+        self.snapshot_id = snapshot_id
+        # NOTE: Only set in static mode, where canonical codewords are rebuilt from their lengths.
+        self.code_lengths = [int(length) for length in code_lengths] if code_lengths is not None else None
+        # NOTE: Update algorithm of every tree, see AdaptativeBinaryTree.
+        self.tree_algorithm = tree_algorithm
+        self.version = version
+
+
+    def is_image(self):
+        return self.shape is not None
+
+
+    def is_planar(self):
+        return self.predictor is not None
+
+
+    def has_contexts(self):
+        return self.context_order > 0
+
+
+    def has_aging(self):
+        return bool(self.rescale_interval or self.max_weight)
+
+
+    def is_static(self):
+        return self.code_lengths is not None
+
+
+    def get_header_length(self):
+        header_length = self.HEADER_STRUCTS[self.version].size
+        if self.blocks is not None:
+            header_length += self.BLOCK_COUNT_STRUCT.size + len(self.blocks) * self.BLOCK_STRUCT.size
+        if self.is_planar():
+            header_length += self.PLANAR_STRUCT.size
+        if self.has_contexts():
+            header_length += self.CONTEXT_STRUCT.size
+        if self.has_aging():
+            header_length += self.AGING_STRUCT.size
+        if self.snapshot_id is not None:
+            header_length += self.SNAPSHOT_STRUCT.size
+        if self.is_static():
+            header_length += self.STATIC_STRUCT.size + (len(self.code_lengths) + 1) // 2
+        if self.seek_index_offset is not None:
+            header_length += self.SEEK_INDEX_STRUCT.size
+        return header_length
+
+
+    def pack(self):
+        flags = 0
+        height, width, channels = 0, 0, 0
+        if self.is_image():
+            flags |= self.IMAGE_FLAG
+            height, width = self.shape[:2]
+            channels = self.shape[2] if len(self.shape) == 3 else 1
+        if self.blocks is not None:
+            flags |= self.BLOCKS_FLAG
+        if self.is_planar():
+            flags |= self.PLANAR_FLAG
+        if self.has_contexts():
+            flags |= self.CONTEXT_FLAG
+        if self.has_aging():
+            flags |= self.AGING_FLAG
+        if self.snapshot_id is not None:
+            flags |= self.SNAPSHOT_FLAG
+        if self.is_static():
+            flags |= self.STATIC_FLAG
+        if self.seek_index_offset is not None:
+            flags |= self.SEEK_INDEX_FLAG
+        if self.tree_algorithm == 'vitter':
+            flags |= self.VITTER_FLAG
+
+        header = self.HEADER_STRUCTS[self.version].pack(self.MAGIC, self.version, flags, self.padding_bits, channels,
+                                                        self.original_length, height, width)
+
+        ##### Block table.
+        if self.blocks is not None:
+            header += self.BLOCK_COUNT_STRUCT.pack(len(self.blocks))
+            header += b''.join([self.BLOCK_STRUCT.pack(*block) for block in self.blocks])
+
+        ##### Planar image predictor.
+        if self.is_planar():
+            header += self.PLANAR_STRUCT.pack(self.predictor)
+
+        ##### Context mode parameters.
+        if self.has_contexts():
+            header += self.CONTEXT_STRUCT.pack(self.context_order, self.max_context_trees)
+
+        ##### Weight aging policy.
+        if self.has_aging():
+            header += self.AGING_STRUCT.pack(self.rescale_interval, self.max_weight)
+
+        ##### Tree snapshot identifier.
+        if self.snapshot_id is not None:
+            header += self.SNAPSHOT_STRUCT.pack(self.snapshot_id)
+
+        ##### Static code lengths.
+        if self.is_static():
+            code_lengths = self.code_lengths + [0] * (len(self.code_lengths) % 2)
+            header += self.STATIC_STRUCT.pack(len(self.code_lengths))
+            header += bytes([(high << 4) | low for high, low in zip(code_lengths[0::2], code_lengths[1::2])])
+
+        ##### Seek index position.
+        if self.seek_index_offset is not None:
+            header += self.SEEK_INDEX_STRUCT.pack(self.seek_index_offset)
+
+        return header
+
+
+    @classmethod
+    def unpack(cls, buffer):
+        if len(buffer) < cls.VERSION_STRUCT.size:
+            raise ValueError("The provided buffer is too short to hold a container header.")
+        magic, version = cls.VERSION_STRUCT.unpack_from(buffer)
+        if magic != cls.MAGIC:
+            raise ValueError("The provided buffer is not an Adaptative Huffman container.")
+        if version not in cls.HEADER_STRUCTS:
+            raise ValueError(f"Unsupported container version {version}.")
+        if len(buffer) < cls.HEADER_STRUCTS[version].size:
+            raise ValueError("The provided buffer is too short to hold a container header.")
+
+        _, _, flags, padding_bits, channels, original_length, height, width = \
+            cls.HEADER_STRUCTS[version].unpack_from(buffer)
+
+        ##### Grayscale images are stored without the channel axis.
+        shape = None
+        if flags & cls.IMAGE_FLAG:
+            shape = (height, width) if channels == 1 else (height, width, channels)
+
+        ##### Read block table.
+        blocks = None
+        offset = cls.HEADER_STRUCTS[version].size
+        if flags & cls.BLOCKS_FLAG:
+            blocks_amount, = cls.BLOCK_COUNT_STRUCT.unpack_from(buffer, offset)
+            offset += cls.BLOCK_COUNT_STRUCT.size
+            blocks = [cls.BLOCK_STRUCT.unpack_from(buffer, offset + index * cls.BLOCK_STRUCT.size)
+                      for index in range(blocks_amount)]
+            offset += blocks_amount * cls.BLOCK_STRUCT.size
+
+        ##### Read planar image predictor.
+        predictor = None
+        if flags & cls.PLANAR_FLAG:
+            predictor, = cls.PLANAR_STRUCT.unpack_from(buffer, offset)
+            offset += cls.PLANAR_STRUCT.size
+
+        ##### Read context mode parameters.
+        context_order, max_context_trees = 0, 0
+        if flags & cls.CONTEXT_FLAG:
+            context_order, max_context_trees = cls.CONTEXT_STRUCT.unpack_from(buffer, offset)
+            offset += cls.CONTEXT_STRUCT.size
+
+        ##### Read weight aging policy.
+        rescale_interval, max_weight = 0, 0
+        if flags & cls.AGING_FLAG:
+            rescale_interval, max_weight = cls.AGING_STRUCT.unpack_from(buffer, offset)
+            offset += cls.AGING_STRUCT.size
+
+        ##### Read tree snapshot identifier.
+        snapshot_id = None
+        if flags & cls.SNAPSHOT_FLAG:
+            snapshot_id, = cls.SNAPSHOT_STRUCT.unpack_from(buffer, offset)
+            offset += cls.SNAPSHOT_STRUCT.size
+
+        ##### Read static code lengths.
+        code_lengths = None
+        if flags & cls.STATIC_FLAG:
+            symbols_amount, = cls.STATIC_STRUCT.unpack_from(buffer, offset)
+            offset += cls.STATIC_STRUCT.size
+            packed_lengths = bytes(buffer[offset:offset + (symbols_amount + 1) // 2])
+            code_lengths = [length for byte in packed_lengths for length in (byte >> 4, byte & 0xF)][:symbols_amount]
+            offset += len(packed_lengths)
+
+        ##### Read seek index position.
+        seek_index_offset = None
+        if flags & cls.SEEK_INDEX_FLAG:
+            seek_index_offset, = cls.SEEK_INDEX_STRUCT.unpack_from(buffer, offset)
+
+        return cls(original_length, padding_bits, shape, blocks, seek_index_offset, predictor, context_order,
+                   max_context_trees, rescale_interval, max_weight, snapshot_id, code_lengths,
+                   'vitter' if flags & cls.VITTER_FLAG else 'fgk', version)
+
+
+
+class SeekIndex():
+
+    # NOTE: Index layout (little-endian): checkpoint interval in symbols (Q) and amount of checkpoints (I).
+    # Each checkpoint holds its payload bit offset (Q), its symbol offset (Q),
+    # the length of the serialized tree state (I) and the state itself.
+    INDEX_STRUCT = struct.Struct('<QI')
+    CHECKPOINT_STRUCT = struct.Struct('<QQI')
+
+
+    def __init__(self, interval, checkpoints=None):
+        self.interval = interval
+        # NOTE: List of (bit offset, symbol offset, tree state) tuples, sorted by symbol offset.
+        self.checkpoints = checkpoints if checkpoints is not None else []
+
+
+    def add_checkpoint(self, bit_offset, symbol_offset, tree_state):
+        self.checkpoints.append((bit_offset, symbol_offset, tree_state))
+
+
+    def get_checkpoint(self, symbol_offset):
+        ##### Checkpoints are taken every interval symbols, the first one after interval symbols.
+        checkpoint_index = min(symbol_offset // self.interval, len(self.checkpoints)) - 1
+        return self.checkpoints[checkpoint_index] if checkpoint_index >= 0 else None
+
+
+    def pack(self):
+        index = [self.INDEX_STRUCT.pack(self.interval, len(self.checkpoints))]
+        for bit_offset, symbol_offset, tree_state in self.checkpoints:
+            index += [self.CHECKPOINT_STRUCT.pack(bit_offset, symbol_offset, len(tree_state)), tree_state]
+        return b''.join(index)
+
+
+    @classmethod
+    def unpack(cls, buffer):
+        interval, checkpoints_amount = cls.INDEX_STRUCT.unpack_from(buffer)
+        offset = cls.INDEX_STRUCT.size
+
+        checkpoints = []
+        for _ in range(checkpoints_amount):
+            bit_offset, symbol_offset, state_length = cls.CHECKPOINT_STRUCT.unpack_from(buffer, offset)
+            offset += cls.CHECKPOINT_STRUCT.size
+            checkpoints.append((bit_offset, symbol_offset, bytes(buffer[offset:offset + state_length])))
+            offset += state_length
+
+        return cls(interval, checkpoints)
@@ -0,0 +1,81 @@
+import numpy as np
+
+
+class BitReader():
+
+    # NOTE: Amount of bytes loaded into the bit buffer at each refill.
+    WORD_BYTES = 8
+
+    def __init__(self, buffer, bit_length=None):
+        # NOTE: Any object exposing the buffer protocol (bytes, bytearray, memoryview, mmap) is accepted.
+        # Bits are read straight from the packed bytes, most significant bit first.
+        self.buffer = memoryview(buffer).cast('B')
+        self.bit_length = len(self.buffer) * 8 if bit_length is None else bit_length
+        self.position = 0
+
+        ##### Bits loaded from the buffer but not consumed yet.
+        self.word = 0
+        self.word_bits = 0
+        self.byte_position = 0
+
+
+    @classmethod
+    def from_bit_string(cls, bit_string):
+        ##### Pack a string made of '0' and '1' characters.
+        bits = np.frombuffer(bit_string.encode(), dtype=np.uint8) - ord('0')
+        return cls(np.packbits(bits).tobytes(), len(bits))
+
+
+    def bits_left(self):
+        return self.bit_length - self.position
+
+
+    def seek(self, bit_position):
+        ##### Move to any bit of the buffer, loading the remaining bits of its byte.
+        self.position = bit_position
+        self.byte_position = bit_position >> 3
+        self.word, self.word_bits = 0, 0
+        if bit_position & 7:
+            self.word_bits = 8 - (bit_position & 7)
+            self.word = self.buffer[self.byte_position] & ((1 << self.word_bits) - 1)
+            self.byte_position += 1
+
+
+    def peek_bits(self, bits_amount):
+        while self.word_bits < bits_amount and self.byte_position < len(self.buffer):
+            self.__refill_word()
+        mask = (1 << bits_amount) - 1
+        if self.word_bits >= bits_amount:
+            return (self.word >> (self.word_bits - bits_amount)) & mask
+        ##### Past the end of the buffer, missing bits are read as zeros.
+        return (self.word << (bits_amount - self.word_bits)) & mask
+
+
+    def skip_bits(self, bits_amount):
+        if bits_amount > self.bits_left():
+            raise EOFError("Attempt to read beyond the end of the bitstream.")
+        while self.word_bits < bits_amount:
+            self.__refill_word()
+        self.word_bits -= bits_amount
+        self.word &= (1 << self.word_bits) - 1
+        self.position += bits_amount
+
+
+    def read_bit(self):
+        bit = self.peek_bits(1)
+        self.skip_bits(1)
+        return bit
+
+
+    def read_bits(self, bits_amount):
+        value = self.peek_bits(bits_amount)
+        self.skip_bits(bits_amount)
+        return value
+
+
+    ########## Private Methods
+    def __refill_word(self):
+        chunk = self.buffer[self.byte_position:self.byte_position + self.WORD_BYTES]
+        self.word = (self.word << (8 * len(chunk))) | int.from_bytes(chunk, 'big')
+        self.word_bits += 8 * len(chunk)
+        self.byte_position += len(chunk)
@@ -0,0 +1,89 @@
+import numpy as np
+
+
+class BitWriter():
+
+    # NOTE: Bits are kept in an integer word and only spilled to the byte buffer once it holds this many bits.
+    WORD_BITS = 64
+    INITIAL_CAPACITY = 2**16
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        ##### Preallocated byte buffer, doubled whenever it gets full.
+        self.buffer = bytearray(capacity)
+        self.byte_length = 0
+
+        ##### Bits written but not spilled yet, most significant bit first.
+        self.word = 0
+        self.word_bits = 0
+
+
+    def write(self, value, bits_amount):
+        self.word = (self.word << bits_amount) | value
+        self.word_bits += bits_amount
+        if self.word_bits >= self.WORD_BITS:
+            self.__spill_word()
+
+
+    def write_bytes(self, data):
+        # NOTE: Any object exposing the buffer protocol (bytes, bytearray, memoryview, np.uint8 arrays) is accepted.
+        data = memoryview(data).cast('B')
+        ##### Byte-aligned data is copied straight to the buffer.
+        if self.word_bits == 0:
+            self.__append_bytes(data)
+        else:
+            self.write(int.from_bytes(data, 'big'), 8 * len(data))
+
+
+    def get_bit_length(self):
+        return 8 * self.byte_length + self.word_bits
+
+
+    def get_padding_bits(self):
+        return (-self.get_bit_length()) % 8
+
+
+    def get_buffer(self):
+        ##### Packed bits, with the last byte padded with zeros.
+        # NOTE: The returned memoryview shares the writer buffer. It must be released before writing again,
+        # since the buffer can not be resized while it is exported.
+        self.__spill_word()
+        packed_length = self.byte_length
+        if self.word_bits:
+            self.__reserve(1)
+            self.buffer[self.byte_length] = self.word << (8 - self.word_bits)
+            packed_length += 1
+        return memoryview(self.buffer)[:packed_length]
+
+
+    def flush_bytes(self):
+        ##### Hand out every complete byte, keeping only the bits of the last incomplete one.
+        self.__spill_word()
+        complete_bytes = bytes(self.buffer[:self.byte_length])
+        self.byte_length = 0
+        return complete_bytes
+
+
+    def get_bit_string(self):
+        bits = np.unpackbits(np.frombuffer(self.get_buffer(), dtype=np.uint8))[:self.get_bit_length()]
+        return (bits + ord('0')).tobytes().decode()
+
+
+    ########## Private Methods
+    def __spill_word(self):
+        ##### Move every complete byte of the word to the buffer.
+        spilled_bytes = self.word_bits // 8
+        if spilled_bytes:
+            self.word_bits -= 8 * spilled_bytes
+            self.__append_bytes((self.word >> self.word_bits).to_bytes(spilled_bytes, 'big'))
+            self.word &= (1 << self.word_bits) - 1
+
+
+    def __append_bytes(self, data):
+        self.__reserve(len(data))
+        self.buffer[self.byte_length:self.byte_length + len(data)] = data
+        self.byte_length += len(data)
+
+
+    def __reserve(self, bytes_amount):
+        while self.byte_length + bytes_amount > len(self.buffer):
+            self.buffer.extend(bytes(max(len(self.buffer), bytes_amount)))
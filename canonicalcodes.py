@@ -0,0 +1,180 @@
+import heapq
+import numpy as np
+
+
+# NOTE: Code lengths are limited to 15 bits, so that they are stored in 4 bits each and the decoding table
+# never holds more than 2**15 entries.
+MAX_CODE_LENGTH = 15
+
+
+def get_code_lengths(counts, max_length=MAX_CODE_LENGTH):
+    ##### Huffman code lengths of the symbols with non-zero counts, zero for the others.
+    counts = np.asarray(counts, dtype=np.int64)
+    code_lengths = np.zeros(len(counts), dtype=np.int64)
+    used_symbols = np.flatnonzero(counts)
+    if len(used_symbols) == 1:
+        code_lengths[used_symbols] = 1
+    if len(used_symbols) <= 1:
+        return code_lengths
+
+    ##### Merge the two lightest nodes until a single tree is left, keeping the parent of each node.
+    # NOTE: Nodes below the amount of used symbols are leaves, merged nodes follow them.
+    heap = [(int(counts[symbol]), node) for node, symbol in enumerate(used_symbols)]
+    heapq.heapify(heap)
+    parents = [0] * (2 * len(used_symbols) - 1)
+    next_node = len(used_symbols)
+    while len(heap) > 1:
+        first_weight, first_node = heapq.heappop(heap)
+        second_weight, second_node = heapq.heappop(heap)
+        parents[first_node] = parents[second_node] = next_node
+        heapq.heappush(heap, (first_weight + second_weight, next_node))
+        next_node += 1
+
+    ##### Depth of each node, from the root down, since parents always come after their children.
+    depths = [0] * len(parents)
+    for node in range(len(parents) - 2, -1, -1):
+        depths[node] = depths[parents[node]] + 1
+    code_lengths[used_symbols] = depths[:len(used_symbols)]
+
+    if code_lengths.max() > max_length:
+        limit_code_lengths(code_lengths, counts, used_symbols, max_length)
+    return code_lengths
+
+
+def limit_code_lengths(code_lengths, counts, used_symbols, max_length):
+    # NOTE: Codes longer than max_length are cut, which breaks the Kraft inequality. It is restored by making
+    # the least frequent codes longer, then any space left is given back to the most frequent codes.
+    code_lengths[used_symbols] = np.minimum(code_lengths[used_symbols], max_length)
+    kraft_sum = int(np.sum(1 << (max_length - code_lengths[used_symbols])))
+    by_count = used_symbols[np.argsort(counts[used_symbols], kind='stable')]
+    while kraft_sum > 1 << max_length:
+        for symbol in by_count:
+            if code_lengths[symbol] < max_length:
+                code_lengths[symbol] += 1
+                kraft_sum -= 1 << (max_length - code_lengths[symbol])
+                break
+    for symbol in by_count[::-1]:
+        while code_lengths[symbol] > 1 and kraft_sum + (1 << (max_length - code_lengths[symbol])) <= 1 << max_length:
+            kraft_sum += 1 << (max_length - code_lengths[symbol])
+            code_lengths[symbol] -= 1
+
+
+def get_canonical_codes(code_lengths):
+    ##### Codewords are assigned in order of length, then of symbol, each one the previous codeword plus one.
+    code_lengths = np.asarray(code_lengths, dtype=np.int64)
+    codes = np.zeros(len(code_lengths), dtype=np.int64)
+    code, previous_length = 0, 0
+    for symbol in np.lexsort((np.arange(len(code_lengths)), code_lengths)):
+        length = int(code_lengths[symbol])
+        if length == 0:
+            continue
+        code <<= length - previous_length
+        codes[symbol] = code
+        code, previous_length = code + 1, length
+    return codes
+
+
+
+class CanonicalHuffmanCode():
+
+    # NOTE: Symbols are encoded by slices of this many symbols, holding one byte per coded bit.
+    SLICE_SYMBOLS = 2**18
+
+    def __init__(self, code_lengths):
+        # NOTE: Code lengths are all the decoder needs, canonical codewords are rebuilt from them.
+        self.code_lengths = np.asarray(code_lengths, dtype=np.int64)
+        self.codes = get_canonical_codes(self.code_lengths)
+        self.max_length = int(self.code_lengths.max()) if len(self.code_lengths) else 0
+        self.decoding_table = None
+
+
+    @classmethod
+    def from_symbols(cls, symbols, symbols_amount=2**8, max_length=MAX_CODE_LENGTH):
+        ##### Code built from the histogram of the symbols, counted in a single vectorized pass.
+        counts = np.bincount(np.asarray(symbols).reshape(-1), minlength=symbols_amount)
+        return cls(get_code_lengths(counts, max_length))
+
+
+    def get_coded_bits(self, symbols):
+        return int(np.sum(self.code_lengths[np.asarray(symbols)]))
+
+
+    def encode(self, symbols, bitstream):
+        ##### Write the codewords of the symbols to a BitWriter.
+        for start in range(0, len(symbols), self.SLICE_SYMBOLS):
+            self.__encode_slice(np.asarray(symbols[start:start + self.SLICE_SYMBOLS]), bitstream)
+
+
+    def decode(self, bitstream, decoded_output, symbols_amount):
+        ##### Read symbols_amount symbols from a BitReader, into the beginning of decoded_output.
+        # NOTE: A table indexed by the next max_length bits gives the symbol and the length of its codeword.
+        # Bits are read straight from the reader buffer, which is moved past the decoded codewords at the end.
+        if self.decoding_table is None:
+            self.decoding_table = self.__build_decoding_table()
+        table, table_bits = self.decoding_table, self.max_length
+        table_mask = (1 << table_bits) - 1
+        buffer = bitstream.buffer
+        byte_position, bit_offset = bitstream.position >> 3, bitstream.position & 7
+        word, word_bits = 0, 0
+        if bit_offset:
+            word, word_bits = buffer[byte_position] & (0xFF >> bit_offset), 8 - bit_offset
+            byte_position += 1
+
+        decoded_bits = 0
+        for index in range(symbols_amount):
+            if word_bits < table_bits:
+                ##### Past the end of the buffer, missing bits are read as zeros.
+                chunk = buffer[byte_position:byte_position + 4]
+                word = (word & ((1 << word_bits) - 1)) << 32
+                word |= int.from_bytes(chunk, 'big') << (32 - 8 * len(chunk))
+                word_bits += 32
+                byte_position += 4
+            entry = table[(word >> (word_bits - table_bits)) & table_mask]
+            length = entry & 0xF
+            if length == 0:
+                raise ValueError("The bitstream holds a codeword that is not part of the code.")
+            decoded_output[index] = entry >> 4
+            word_bits -= length
+            decoded_bits += length
+
+        if decoded_bits > bitstream.bits_left():
+            raise EOFError("Attempt to read beyond the end of the bitstream.")
+        bitstream.seek(bitstream.position + decoded_bits)
+        return decoded_bits
+
+
+    ########## Private Methods
+    def __encode_slice(self, symbols, bitstream):
+        ##### Gather the codeword of each symbol, then spread its bits at the position it starts.
+        codes, lengths = self.codes[symbols], self.code_lengths[symbols]
+        if len(symbols) == 0:
+            return
+        if not np.all(lengths):
+            raise ValueError("Some symbols have no codeword in the code.")
+        starts = np.cumsum(lengths) - lengths
+        bits = np.zeros(int(starts[-1] + lengths[-1]), dtype=np.uint8)
+        for bit in range(self.max_length):
+            coded = lengths > bit
+            bits[starts[coded] + bit] = (codes[coded] >> (lengths[coded] - 1 - bit)) & 1
+
+        ##### Complete the last byte of the writer, so that the remaining bits are packed byte by byte.
+        head_bits = min((-bitstream.get_bit_length()) % 8, len(bits))
+        if head_bits:
+            bitstream.write(int(np.packbits(bits[:head_bits])[0]) >> (8 - head_bits), head_bits)
+        complete_bits = head_bits + (len(bits) - head_bits) // 8 * 8
+        bitstream.write_bytes(np.packbits(bits[head_bits:complete_bits]))
+        tail_bits = len(bits) - complete_bits
+        if tail_bits:
+            bitstream.write(int(np.packbits(bits[complete_bits:])[0]) >> (8 - tail_bits), tail_bits)
+
+
+    def __build_decoding_table(self):
+        # NOTE: Canonical codewords sorted by length and symbol cover consecutive ranges of the table.
+        # Entries hold the symbol and the codeword length, entries outside the code have a zero length.
+        symbols = np.lexsort((np.arange(len(self.code_lengths)), self.code_lengths))
+        symbols = symbols[self.code_lengths[symbols] > 0]
+        lengths = self.code_lengths[symbols]
+        entries = np.repeat((symbols << 4) | lengths, 1 << (self.max_length - lengths))
+        table = np.zeros(1 << self.max_length, dtype=np.int64)
+        table[:len(entries)] = entries
+        return table.tolist()
@@ -0,0 +1,145 @@
+from collections import Counter
+
+
+class CodingStats():
+
+    # NOTE: Events accepted by add_hook, with the arguments given to their callbacks:
+    # 'symbol' (symbol, codeword length), fired on sampled symbols;
+    # 'swap' (node, block leader), fired by the tree on every swap;
+    # 'progress' (symbols coded so far, total symbols or None), fired every progress_interval symbols.
+    EVENTS = ('symbol', 'swap', 'progress')
+
+    def __init__(self, sample_interval=1, progress_interval=2**12):
+        # NOTE: Timers and 'symbol' hooks only run on one symbol out of sample_interval.
+        # Counters are always exact, timers are scaled back to the whole run in get_phase_times.
+        if sample_interval < 1:
+            raise ValueError(f"The sample interval must be at least 1, got {sample_interval}.")
+        self.sample_interval = sample_interval
+        self.progress_interval = progress_interval
+        self.hooks = {event: [] for event in self.EVENTS}
+        # NOTE: Set by the codecs when the amount of symbols to be coded is known.
+        self.total_symbols = None
+
+        ##### Codec counters.
+        self.symbols = 0
+        self.nyt_escapes = 0
+        self.bits = 0
+        self.codeword_lengths = Counter()
+        self.table_rebuilds = 0
+
+        ##### Tree counters.
+        # NOTE: Update steps are the nodes visited from the updated leaf up to the root, each one with its own
+        # block leader search. They take the place of the former sibling-property passes.
+        self.update_steps = 0
+        self.swaps = 0
+        self.internal_swaps = 0
+
+        ##### Cumulative time of each phase, in seconds, and amount of symbols it was measured on.
+        self.phase_times = Counter()
+        self.sampled_symbols = 0
+
+
+    def add_hook(self, event, callback):
+        if event not in self.hooks:
+            raise ValueError(f"Unknown event '{event}'. Available events: {', '.join(self.EVENTS)}.")
+        self.hooks[event].append(callback)
+
+
+    def is_sampled(self):
+        return self.symbols % self.sample_interval == 0
+
+
+    def add_phase_time(self, phase, seconds):
+        self.phase_times[phase] += seconds
+
+
+    def record_symbol(self, symbol, codeword_length, bits, is_new, sampled):
+        ##### Called by the codecs once the symbol is coded and the tree updated.
+        self.nyt_escapes += is_new
+        self.bits += bits
+        self.codeword_lengths[codeword_length] += 1
+        if sampled:
+            self.sampled_symbols += 1
+            for callback in self.hooks['symbol']:
+                callback(symbol, codeword_length)
+        self.symbols += 1
+        if self.symbols % self.progress_interval == 0:
+            self.fire_progress()
+
+
+    def record_batch(self, symbols_amount, bits, new_symbols, seconds, phase='kernel'):
+        ##### Compiled kernels only report totals, every symbol of the batch counts as sampled.
+        self.symbols += symbols_amount
+        self.bits += bits
+        self.nyt_escapes += new_symbols
+        self.sampled_symbols += symbols_amount
+        self.phase_times[phase] += seconds
+        self.fire_progress()
+
+
+    def record_swap(self, node, block_leader, is_internal):
+        self.swaps += 1
+        self.internal_swaps += is_internal
+        for callback in self.hooks['swap']:
+            callback(node, block_leader)
+
+
+    def fire_progress(self):
+        for callback in self.hooks['progress']:
+            callback(self.symbols, self.total_symbols)
+
+
+    def get_phase_times(self):
+        ##### Estimated time of each phase over every coded symbol.
+        if not self.sampled_symbols:
+            return {}
+        scale = self.symbols / self.sampled_symbols
+        return {phase: seconds * scale for phase, seconds in self.phase_times.items()}
+
+
+    def get_report(self):
+        return {
+            'symbols': self.symbols,
+            'nyt_escapes': self.nyt_escapes,
+            'bits': self.bits,
+            'bits_per_symbol': self.bits / self.symbols if self.symbols else 0,
+            'codeword_lengths': dict(sorted(self.codeword_lengths.items())),
+            'table_rebuilds': self.table_rebuilds,
+            'update_steps': self.update_steps,
+            'swaps': self.swaps,
+            'internal_swaps': self.internal_swaps,
+            'phase_seconds': self.get_phase_times(),
+        }
+
+
+    def print_report(self):
+        report = self.get_report()
+        print(f"Symbols: {report['symbols']} ({report['nyt_escapes']} NYT escapes);")
+        print(f"Bits: {report['bits']} ({report['bits_per_symbol']:.5f} bits per symbol);")
+        print(f"Tree updates: {report['update_steps']} steps, {report['swaps']} swaps "
+              f"({report['internal_swaps']} moving subtrees);")
+        if report['table_rebuilds']:
+            print(f"Lookup table rebuilds: {report['table_rebuilds']};")
+        histogram = ', '.join([f"{length}: {count}" for length, count in report['codeword_lengths'].items()])
+        if histogram:
+            print(f"Codeword lengths: {histogram};")
+        for phase, seconds in report['phase_seconds'].items():
+            print(f"Time in {phase}: {seconds:.4f} s.")
+
+
+
+def make_progress_hook(description):
+    ##### Progress bar updated by 'progress' events, so its cost does not depend on the amount of symbols.
+    from tqdm import tqdm
+    progress_bar = tqdm(desc=description)
+
+    def update_progress(symbols, total_symbols):
+        if total_symbols is not None and progress_bar.total != total_symbols:
+            progress_bar.total = total_symbols
+            progress_bar.refresh()
+        progress_bar.update(symbols - progress_bar.n)
+        if symbols == total_symbols:
+            progress_bar.close()
+
+    return update_progress
+
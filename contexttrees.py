@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+from adaptativebinarytree import AdaptativeBinaryTree
+
+
+class ContextTreeCache():
+
+    def __init__(self, symbols_amount, context_order=1, max_trees=None, stats=None, rescale_interval=None,
+                 max_weight=None, initial_state=None, tree_algorithm='fgk'):
+        # NOTE: Symbols are coded with the tree of the context_order symbols before them. Contexts are kept
+        # as integers and hashed by the tree dictionary, so any order is accepted.
+        self.symbols_amount = symbols_amount
+        self.context_order = context_order
+        self.symbol_bits = (symbols_amount - 1).bit_length()
+        self.context_mask = (1 << (self.symbol_bits * context_order)) - 1
+        self.context = 0
+
+        ##### Live trees, from the least to the most recently used.
+        # NOTE: Once max_trees trees are alive, the least recently used one is dropped. Encoder and decoder
+        # see the same contexts in the same order, so both drop the same trees.
+        self.trees = OrderedDict()
+        self.max_trees = max_trees
+        self.created_trees = 0
+        self.evicted_trees = 0
+        self.stats = stats
+        # NOTE: Every tree follows the same aging policy, counting only the symbols of its own context.
+        self.rescale_interval = rescale_interval
+        self.max_weight = max_weight
+        # NOTE: Serialized tree every new tree starts from, instead of an empty one.
+        self.initial_state = initial_state
+        self.tree_algorithm = tree_algorithm
+
+
+    @staticmethod
+    def get_max_trees(symbols_amount, memory_budget):
+        ##### Amount of trees fitting in the memory budget, in bytes.
+        tree = AdaptativeBinaryTree(symbols_amount)
+        tree_bytes = sum([array.nbytes for array in (tree.parent, tree.left_child, tree.right_child, tree.weight,
+                                                      tree.symbol, tree.symbol_leaf)])
+        return max(memory_budget // tree_bytes, 1)
+
+
+    def get_tree(self):
+        tree = self.trees.get(self.context)
+        if tree is not None:
+            self.trees.move_to_end(self.context)
+            return tree
+
+        ##### Unseen (or evicted) contexts start from an empty (or primed) tree.
+        tree = AdaptativeBinaryTree(self.symbols_amount, self.tree_algorithm)
+        tree.set_stats(self.stats)
+        tree.set_aging(self.rescale_interval, self.max_weight)
+        if self.initial_state is not None:
+            tree.load_state(self.initial_state)
+        self.trees[self.context] = tree
+        self.created_trees += 1
+        if self.max_trees is not None and len(self.trees) > self.max_trees:
+            self.trees.popitem(last=False)
+            self.evicted_trees += 1
+        return tree
+
+
+    def update_context(self, symbol):
+        self.context = ((self.context << self.symbol_bits) | symbol) & self.context_mask
+
+
+    def set_stats(self, stats):
+        self.stats = stats
+        for tree in self.trees.values():
+            tree.set_stats(stats)
@@ -0,0 +1,110 @@
+import os
+import sys
+import mmap
+import argparse
+import numpy as np
+
+
+def calculate_entropy(counts):
+    ##### Entropy, in bits, of the distribution given by the counts.
+    counts = counts[counts > 0]
+    if len(counts) == 0:
+        return 0.0
+    probabilities = counts / np.sum(counts)
+    return float(-np.sum(probabilities * np.log2(probabilities)))
+
+
+class EntropyStatistics():
+
+    # NOTE: Symbols are counted by slices of this many symbols, so memory does not grow with the update size.
+    SLICE_SYMBOLS = 2**20
+
+    def __init__(self, max_order=2, symbols_amount=2**8):
+        # NOTE: Order-k counts are kept for every string of k + 1 symbols, in a dense array of
+        # symbols_amount ** (k + 1) bins (128 MiB for bytes and order 2), whatever the source length.
+        self.max_order = max_order
+        self.symbols_amount = symbols_amount
+        self.counts = [np.zeros(symbols_amount ** (order + 1), dtype=np.int64) for order in range(max_order + 1)]
+        self.symbols = 0
+        ##### Last symbols of the previous update, the contexts of the first symbols of the next one.
+        self.history = np.array([], dtype=np.int64)
+
+
+    def update(self, symbols):
+        ##### Count symbols and the strings ending on them, in a single pass over the updated symbols.
+        symbols = np.asarray(symbols).reshape(-1)
+        for start in range(0, len(symbols), self.SLICE_SYMBOLS):
+            self.__update_slice(symbols[start:start + self.SLICE_SYMBOLS])
+
+
+    def get_entropy(self, order=0):
+        ##### Order-k conditional entropy, H(X | k previous symbols) = H(k + 1 symbols) - H(k symbols).
+        joint_counts = self.counts[order]
+        if order == 0:
+            return calculate_entropy(joint_counts)
+        context_counts = joint_counts.reshape(-1, self.symbols_amount).sum(axis=1)
+        return calculate_entropy(joint_counts) - calculate_entropy(context_counts)
+
+
+    def get_report(self):
+        return {
+            'symbols': self.symbols,
+            'entropy_bps': {order: self.get_entropy(order) for order in range(self.max_order + 1)},
+        }
+
+
+    def print_report(self):
+        for order, entropy in self.get_report()['entropy_bps'].items():
+            print(f"Order-{order} entropy: {entropy:.5f} bits per symbol.")
+
+
+    ########## Private Methods
+    def __update_slice(self, symbols):
+        extended = np.concatenate([self.history, symbols.astype(np.int64)])
+        for order, counts in enumerate(self.counts):
+            ##### Strings of order + 1 symbols ending on the new symbols, packed into a single integer.
+            first_window = max(len(self.history), order) - order
+            windows_amount = len(extended) - order - first_window
+            if windows_amount <= 0:
+                continue
+            codes = np.zeros(windows_amount, dtype=np.int64)
+            for offset in range(first_window, first_window + order + 1):
+                codes = codes * self.symbols_amount + extended[offset:offset + windows_amount]
+
+            # NOTE: Small slices are counted sparsely, so large count arrays are not scanned for a few symbols.
+            if len(counts) <= 4 * windows_amount:
+                counts += np.bincount(codes, minlength=len(counts))
+            else:
+                unique_codes, code_counts = np.unique(codes, return_counts=True)
+                counts[unique_codes] += code_counts
+
+        self.symbols += len(symbols)
+        self.history = extended[len(extended) - min(self.max_order, len(extended)):]
+
+
+
+def calculate_file_statistics(file_path, max_order=2):
+    ##### Statistics of the raw bytes of a file, memory-mapped so that any file size is read in bounded memory.
+    statistics = EntropyStatistics(max_order)
+    with open(file_path, "rb") as source:
+        if os.fstat(source.fileno()).st_size == 0:
+            return statistics
+        with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as source_map:
+            statistics.update(np.frombuffer(source_map, dtype=np.uint8))
+    return statistics
+
+
+
+if __name__ == "__main__":
+    ##### Receives file to be measured from command line.
+    parser = argparse.ArgumentParser(description="Computes the order-0 to order-k entropy of the bytes of a file "
+                                                 "in a single pass.")
+
+    parser.add_argument('--file', required=True, help="Path to the file to be measured.")
+    parser.add_argument('--max_order', required=False, type=int, default=2,
+                        help="Highest context order, in symbols.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    calculate_file_statistics(args.file, args.max_order).print_report()
@@ -1,149 +1,547 @@
 import os
 import sys
+import mmap
 import time
 import argparse
 import numpy as np
 
 from pathlib import Path
-from PIL import Image 
-from bitstream import BitStream, ReadError
+from itertools import repeat
 
+from bitreader import BitReader
+from binarycontainer import BinaryContainerHeader, SeekIndex
+from codingstats import CodingStats, make_progress_hook
 from adaptativebinarytree import AdaptativeBinaryTree
+from contexttrees import ContextTreeCache
+from treesnapshots import DEFAULT_SNAPSHOT_DIRECTORY, load_snapshot
+from imagepredictors import revert_predictor
+from canonicalcodes import CanonicalHuffmanCode
 
 
 class HuffmanDecoder():
 
-    def __init__(self, binary_path=None, decoded_file_path=None, symbols_amount=2**8):
+    # NOTE: A lookup table is only rebuilt after this amount of symbols without structural changes in the tree.
+    TABLE_REBUILD_SYMBOLS = 32
+
+    def __init__(self, binary_path=None, decoded_file_path=None, symbols_amount=2**8, lookup_bits=8, workers=None,
+                 use_jit=False, stats=None, context_order=0, max_context_trees=None, rescale_interval=None,
+                 max_weight=None, snapshot_id=None, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY,
+                 tree_algorithm='fgk'):
         self.binary_path = binary_path
         self.decoded_file_path = decoded_file_path
-        self.adaptative_binary_tree = AdaptativeBinaryTree(symbols_amount)
+        self.symbols_amount = symbols_amount
+        self.stats = stats
+        # NOTE: Amount of bits resolved at once by the decoding lookup table. Zero disables the table.
+        self.lookup_bits = lookup_bits
+        # NOTE: Amount of processes used to decode block-coded files. Defaults to the amount of CPU cores.
+        self.workers = workers
+        # NOTE: The Numba kernels walk the tree bit by bit, without lookup tables. Without Numba, Python is used.
+        # Numba is only imported when the kernels are requested.
+        self.use_jit = False
+        if use_jit:
+            import jitkernels
+            self.use_jit = jitkernels.NUMBA_AVAILABLE
+        # NOTE: Without a container header, decoding goes on until the bitstream is exhausted.
+        self.original_length = None
+        self.shape = None
+        self.blocks = None
+        self.predictor = None
+        self.seek_index = None
+        # NOTE: Only set for static mode containers, which store the code lengths instead of updating a tree.
+        self.static_code = None
+        self.bitstream = None
+        self.decoded_symbols = 0
+
+        ##### Weight aging policy and tree snapshot, replaced by the ones in the container header.
+        # NOTE: Snapshots are looked up by identifier in snapshot_directory, and read once per process.
+        self.rescale_interval = rescale_interval
+        self.max_weight = max_weight
+        self.snapshot_id = snapshot_id
+        self.snapshot_directory = snapshot_directory
+        # NOTE: Tree update algorithm, also replaced by the one in the container header.
+        self.tree_algorithm = tree_algorithm
+        self.__reset_tree()
+
+        ##### Context mode parameters, replaced by the ones in the container header.
+        # NOTE: Context trees must be evicted exactly as in the encoder, so max_context_trees must match it.
+        self.context_order = context_order
+        self.max_context_trees = max_context_trees
+        self.__reset_context_trees()
+
+        ##### Optional instrumentation, shared with the tree.
+        self.set_stats(stats)
+
+        ##### Lookup table state, kept between chunks.
+        self.__reset_lookup_table()
 
     
-    def decode_binary(self):
-        ##### Read bitstream from file.
+    def set_stats(self, stats):
+        # NOTE: Without stats, the plain decoding loop runs and no counter or timer is touched.
+        self.stats = stats
+        self.adaptative_binary_tree.set_stats(stats)
+        if self.context_trees is not None:
+            self.context_trees.set_stats(stats)
+
+
+    def decode_binary(self, chunk_size=2**16):
+        ##### Read bitstream from file and decode its header.
         self.__read_binary_file()
-        ##### Decode header
-        self.__decode_header()
-        ##### Decode remaining bitstream.
-        self.decode_with_adaptative_hc()
-        ##### Save decoded file
-        self.__save_decoded_file()
+        decoding_start = time.time()
+        # NOTE: Images are rebuilt as a whole, byte sources are written to disk chunk by chunk.
+        if self.image_file:
+            self.decode_with_adaptative_hc(verbose=False)
+            self.__save_decoded_file()
+        else:
+            self.__write_decoded_file(chunk_size)
+        self.__print_process_duration(decoding_start, time.time(), "Decoding Time")
+
+
+    def decode_binary_in_chunks(self, chunk_size=2**16):
+        self.decode_binary(chunk_size)
+
+
+    def decode_range(self, start, end):
+        ##### Read bitstream from file, unless a container was already provided.
+        if self.bitstream is None:
+            self.__read_binary_file()
+        # NOTE: Payloads without a length are decoded until their bits run out, so the range may end early.
+        if self.original_length is not None:
+            end = min(end, self.original_length)
+        if start >= end:
+            return bytearray()
+
+        ##### Planar images are rebuilt as a whole, since every pixel needs all the channels.
+        if self.predictor is not None:
+            self.decode_with_adaptative_hc(verbose=False)
+            return bytearray(self.decoded_bytes[start:end])
+
+        ##### Block-coded files only need the blocks overlapping the range.
+        if self.blocks is not None:
+            return self.__decode_range_from_blocks(start, end)
+
+        ##### Jump to the last checkpoint before the range, or to the beginning of the payload.
+        checkpoint = self.seek_index.get_checkpoint(start) if self.seek_index is not None else None
+        if checkpoint is not None:
+            bit_offset, self.decoded_symbols, tree_state = checkpoint
+            self.adaptative_binary_tree.load_state(tree_state)
+            # NOTE: Rescales depend on the amount of symbols coded with the tree, which checkpoints do not store.
+            self.adaptative_binary_tree.coded_symbols = self.decoded_symbols
+        else:
+            bit_offset, self.decoded_symbols = 0, 0
+            self.__reset_tree()
+            self.__reset_context_trees()
+        self.bitstream.seek(bit_offset)
+        self.__reset_lookup_table()
+
+        ##### Symbols between the checkpoint and the range are decoded and discarded.
+        discarded_symbols = bytearray(min(start - self.decoded_symbols, 2**16))
+        while self.decoded_symbols < start:
+            if not self.__decode_symbols(discarded_symbols, min(start - self.decoded_symbols, len(discarded_symbols))):
+                return bytearray()
+        return self.decode_chunk(end - start)
 
 
     def read_bitstream(self, bitstream):
-        if isinstance(bitstream, BitStream):
-            self.bitstream = bitstream
+        if isinstance(bitstream, (bytes, bytearray, memoryview, mmap.mmap)):
+            ##### Packed container, as written by the encoder.
+            self.__decode_header(bitstream)
+        # NOTE: BitStream instances can only exist once the bitstream package is loaded, so it is never imported here.
+        elif 'bitstream' in sys.modules and isinstance(bitstream, sys.modules['bitstream'].BitStream):
+            self.bitstream = BitReader.from_bit_string(str(bitstream))
         elif isinstance(bitstream, str):
-            bool_list = list(map(lambda bit: bool(int(bit)), list(bitstream)))
-            self.bitstream = BitStream()
-            self.bitstream.write(bool_list)
+            self.bitstream = BitReader.from_bit_string(bitstream)
         else:
-            raise TypeError("The provided bitstream should already be a bitstream.BitStream instance or a string.")
+            raise TypeError("The provided bitstream should be a packed container (bytes-like object), "
+                            "a bitstream.BitStream instance or a string.")
+
+
+    def read_payload(self, payload, original_length, padding_bits=0):
+        ##### Read coded bits without any header.
+        self.original_length = original_length
+        self.bitstream = BitReader(payload, len(memoryview(payload)) * 8 - padding_bits)
 
         
     def decode_with_adaptative_hc(self, verbose=True):
         ##### Measure decoding time.
         decoding_start = time.time()
 
-        ##### Create attribute to save decoded bytes.
-        self.decoded_bytes = []
-        ##### Read first symbol and insert in the tree.
-        symbol = self.bitstream.read(np.uint8, 1)[0]
-        self.adaptative_binary_tree.insert_symbol(symbol)
-        self.decoded_bytes.append(symbol)
-        ##### Search for valid codeword.
-        # NOTE: Since now the codeword do not have a fixed-lenght, we must look for a leaf node.
-        bitstream_finished = False
-        while bitstream_finished is not True:
-            try:
-                codeword_bool_list = self.bitstream.read(bool, 1)
-                codeword = self.__convert_bool_list_to_str(codeword_bool_list)
-                ##### Increase the codeword bit by bit, until reaching a valid symbol.
-                symbol = None
-                while symbol is None:
-                    symbol = self.adaptative_binary_tree.get_symbol_from_codeword(codeword)
-                    if symbol is None:
-                        codeword_bool_list += self.bitstream.read(bool, 1)
-                        codeword = self.__convert_bool_list_to_str(codeword_bool_list)
-                    else:
-                        if symbol == 'NYT':
-                            symbol = self.bitstream.read(np.uint8, 1)[0]
-                ##### After finding the symbol, it can be added to the decoded_bytes_list.
-                self.adaptative_binary_tree.insert_symbol(symbol)
-                self.decoded_bytes.append(symbol)
-            except ReadError:
-                bitstream_finished = True
+        ##### Output buffer, preallocated with the amount of symbols stored in the header.
+        # NOTE: Without a header, every symbol takes at least one bit, so the bits left are an upper bound.
+        output_length = self.original_length if self.original_length is not None else self.bitstream.bits_left()
+        self.decoded_bytes = bytearray(output_length)
+        ##### Decode symbols until reaching the original length.
+        if self.predictor is not None:
+            self.__merge_channels(self.__decode_blocks(), self.decoded_bytes)
+        elif self.blocks is not None:
+            self.__join_blocks(self.__decode_blocks(), self.decoded_bytes)
+        else:
+            if self.stats is not None:
+                self.stats.total_symbols = self.original_length
+            decoded_symbols = self.__decode_symbols(self.decoded_bytes)
+            del self.decoded_bytes[decoded_symbols:]
+            if self.stats is not None:
+                self.stats.fire_progress()
 
         decoding_finish = time.time()
         if verbose:
             self.__print_process_duration(decoding_start, decoding_finish, "Decoding Time")
 
 
+    def decode_chunk(self, symbols_amount):
+        ##### Decode up to symbols_amount symbols, carrying the tree over from previous chunks.
+        decoded_chunk = bytearray(symbols_amount)
+        decoded_symbols = self.__decode_symbols(decoded_chunk, symbols_amount)
+        del decoded_chunk[decoded_symbols:]
+        return decoded_chunk
+
+
+    def decode_frame(self, payload, symbols_amount):
+        ##### Decode a frame written by HuffmanEncoder.encode_frame, carrying the tree over from previous frames.
+        # NOTE: Frames end on a byte boundary, so their padding bits are simply left unread.
+        self.read_payload(payload, symbols_amount)
+        self.decoded_symbols = 0
+        return self.decode_chunk(symbols_amount)
+
+
     def get_decoded_bytes(self):
-        return self.decoded_bytes
+        # NOTE: The decoded buffer is exposed without copying it.
+        return memoryview(self.decoded_bytes)
 
 
     ########## Private Methods
+    def __reset_tree(self):
+        ##### Fresh tree, following the aging policy and primed with the snapshot, if any.
+        self.snapshot_state = None
+        if self.snapshot_id is not None:
+            self.snapshot_state = load_snapshot(self.snapshot_id, self.symbols_amount, self.snapshot_directory)
+        self.adaptative_binary_tree = AdaptativeBinaryTree(self.symbols_amount, self.tree_algorithm)
+        self.adaptative_binary_tree.set_stats(self.stats)
+        self.adaptative_binary_tree.set_aging(self.rescale_interval, self.max_weight)
+        if self.snapshot_state is not None:
+            self.adaptative_binary_tree.load_state(self.snapshot_state)
+
+
+    def __reset_context_trees(self):
+        self.context_trees = None
+        if self.context_order:
+            self.context_trees = ContextTreeCache(self.symbols_amount, self.context_order, self.max_context_trees,
+                                                  self.stats, self.rescale_interval, self.max_weight,
+                                                  self.snapshot_state, self.tree_algorithm)
+
+
+    def __reset_lookup_table(self):
+        self.table_version = self.adaptative_binary_tree.structure_version
+        self.stable_symbols = 0
+        self.table_nodes, self.table_lengths = None, None
+
+
+    def __decode_range_from_blocks(self, start, end):
+        decoded_range = bytearray()
+        block_start = 0
+        for index, (offset, block_length, padding_bits) in enumerate(self.blocks):
+            block_end = block_start + block_length
+            if block_end > start and block_start < end:
+                payload_end = self.blocks[index + 1][0] if index + 1 < len(self.blocks) else len(self.payload)
+                decoded_block = decode_block(self.payload[offset:payload_end], block_length, padding_bits,
+                                             self.symbols_amount, self.lookup_bits, self.use_jit, self.context_order,
+                                             self.max_context_trees, self.rescale_interval, self.max_weight,
+                                             self.snapshot_id, self.snapshot_directory, self.tree_algorithm)
+                decoded_range += decoded_block[max(start - block_start, 0):end - block_start]
+            block_start = block_end
+        return decoded_range
+
+
+    def __decode_blocks(self):
+        ##### Decode independent blocks in parallel, yielding them in order.
+        payloads, blocks_lengths, blocks_padding = [], [], []
+        for index, (offset, block_length, padding_bits) in enumerate(self.blocks):
+            end = self.blocks[index + 1][0] if index + 1 < len(self.blocks) else len(self.payload)
+            payloads.append(bytes(self.payload[offset:end]))
+            blocks_lengths.append(block_length)
+            blocks_padding.append(padding_bits)
+
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            yield from executor.map(decode_block, payloads, blocks_lengths, blocks_padding,
+                                    repeat(self.symbols_amount), repeat(self.lookup_bits), repeat(self.use_jit),
+                                    repeat(self.context_order), repeat(self.max_context_trees),
+                                    repeat(self.rescale_interval), repeat(self.max_weight),
+                                    repeat(self.snapshot_id), repeat(self.snapshot_directory),
+                                    repeat(self.tree_algorithm))
+
+
+    def __join_blocks(self, decoded_blocks, decoded_output):
+        position = 0
+        for decoded_block in decoded_blocks:
+            decoded_output[position:position + len(decoded_block)] = decoded_block
+            position += len(decoded_block)
+
+
+    def __merge_channels(self, decoded_channels, decoded_output):
+        ##### Revert the pixel predictor of each channel, writing it straight into the interleaved output.
+        height, width = self.shape[:2]
+        image = np.frombuffer(decoded_output, dtype=np.uint8).reshape(height, width, -1)
+        for channel, decoded_channel in enumerate(decoded_channels):
+            residual = np.frombuffer(decoded_channel, dtype=np.uint8).reshape(height, width)
+            image[:, :, channel] = revert_predictor(residual, self.predictor)
+
+
+    def __write_decoded_file(self, chunk_size):
+        ##### Decoded symbols go through a single chunk buffer to the file, exactly as they were coded.
+        self.decoded_file_path += '.txt'
+        with open(self.decoded_file_path, "wb") as decoded_file:
+            ##### Block-coded files are written block by block.
+            if self.blocks is not None:
+                for decoded_block in self.__decode_blocks():
+                    decoded_file.write(decoded_block)
+                return
+            if self.stats is not None:
+                self.stats.total_symbols = self.original_length
+            chunk_buffer = bytearray(chunk_size)
+            while self.__symbols_remaining():
+                decoded_symbols = self.__decode_symbols(chunk_buffer, chunk_size)
+                decoded_file.write(memoryview(chunk_buffer)[:decoded_symbols])
+            if self.stats is not None:
+                self.stats.fire_progress()
+
+
+    def __decode_symbols(self, decoded_output, symbols_amount=None):
+        # NOTE: Symbols are written from the beginning of decoded_output, which must hold all of them.
+        # Returns the amount of decoded symbols.
+        if self.static_code is not None:
+            return self.__decode_symbols_static(decoded_output, symbols_amount)
+        if self.context_trees is not None:
+            return self.__decode_symbols_with_contexts(decoded_output, symbols_amount)
+        if self.use_jit:
+            return self.__decode_symbols_with_jit(decoded_output, symbols_amount)
+        if self.stats is not None:
+            return self.__decode_symbols_with_stats(decoded_output, symbols_amount)
+
+        # NOTE: Codewords are found by walking the tree from the root. While the tree structure is stable,
+        # a lookup table resolves the first lookup_bits bits of the walk at once.
+        tree = self.adaptative_binary_tree
+        first_symbol = self.decoded_symbols
+        last_symbol = None if symbols_amount is None else self.decoded_symbols + symbols_amount
+        while self.__symbols_remaining() and self.decoded_symbols != last_symbol:
+            if tree.structure_version != self.table_version:
+                self.table_version, self.stable_symbols = tree.structure_version, 0
+                self.table_nodes = None
+            elif self.table_nodes is None and self.lookup_bits and self.stable_symbols >= self.TABLE_REBUILD_SYMBOLS:
+                self.table_nodes, self.table_lengths = tree.build_decoding_table(self.lookup_bits)
+            self.stable_symbols += 1
+
+            ##### Resolve the beginning of the codeword with the lookup table.
+            if self.table_nodes is not None:
+                prefix = self.bitstream.peek_bits(self.lookup_bits)
+                node = self.table_nodes[prefix]
+                self.bitstream.skip_bits(self.table_lengths[prefix])
+            else:
+                node = tree.root_node_number
+            ##### Finish the walk bit by bit, until reaching a leaf.
+            while tree.left_child[node] >= 0:
+                node = tree.right_child[node] if self.bitstream.read_bit() else tree.left_child[node]
+
+            ##### New symbols are sent with 8 bits after the NYT codeword.
+            if node == tree.nyt_node:
+                symbol = self.bitstream.read_bits(8)
+            else:
+                symbol = int(tree.symbol[node])
+            ##### After finding the symbol, it can be added to the decoded output.
+            tree.insert_symbol(symbol)
+            decoded_output[self.decoded_symbols - first_symbol] = symbol
+            self.decoded_symbols += 1
+        return self.decoded_symbols - first_symbol
+
+
+    def __decode_symbols_with_stats(self, decoded_output, symbols_amount=None):
+        ##### Same loop as __decode_symbols, timing each phase of the sampled symbols.
+        tree, stats = self.adaptative_binary_tree, self.stats
+        first_symbol = self.decoded_symbols
+        last_symbol = None if symbols_amount is None else self.decoded_symbols + symbols_amount
+        while self.__symbols_remaining() and self.decoded_symbols != last_symbol:
+            sampled = stats.is_sampled()
+            if sampled:
+                table_start = time.perf_counter()
+            if tree.structure_version != self.table_version:
+                self.table_version, self.stable_symbols = tree.structure_version, 0
+                self.table_nodes = None
+            elif self.table_nodes is None and self.lookup_bits and self.stable_symbols >= self.TABLE_REBUILD_SYMBOLS:
+                self.table_nodes, self.table_lengths = tree.build_decoding_table(self.lookup_bits)
+                stats.table_rebuilds += 1
+            self.stable_symbols += 1
+
+            if sampled:
+                lookup_start = time.perf_counter()
+            codeword_start = self.bitstream.position
+            if self.table_nodes is not None:
+                prefix = self.bitstream.peek_bits(self.lookup_bits)
+                node = self.table_nodes[prefix]
+                self.bitstream.skip_bits(self.table_lengths[prefix])
+            else:
+                node = tree.root_node_number
+            while tree.left_child[node] >= 0:
+                node = tree.right_child[node] if self.bitstream.read_bit() else tree.left_child[node]
+            codeword_length = self.bitstream.position - codeword_start
+
+            is_new = bool(node == tree.nyt_node)
+            if is_new:
+                symbol = self.bitstream.read_bits(8)
+            else:
+                symbol = int(tree.symbol[node])
+            if sampled:
+                update_start = time.perf_counter()
+            tree.insert_symbol(symbol)
+            if sampled:
+                update_finish = time.perf_counter()
+                stats.add_phase_time('table rebuild', lookup_start - table_start)
+                stats.add_phase_time('codeword lookup', update_start - lookup_start)
+                stats.add_phase_time('tree update', update_finish - update_start)
+
+            stats.record_symbol(symbol, codeword_length, codeword_length + 8 * is_new, is_new, sampled)
+            decoded_output[self.decoded_symbols - first_symbol] = symbol
+            self.decoded_symbols += 1
+        return self.decoded_symbols - first_symbol
+
+
+    def __decode_symbols_with_contexts(self, decoded_output, symbols_amount=None):
+        ##### Same loop as __decode_symbols, decoding each symbol with the tree of its context.
+        # NOTE: Trees change at every symbol, so codewords are always walked bit by bit.
+        contexts, stats = self.context_trees, self.stats
+        first_symbol = self.decoded_symbols
+        last_symbol = None if symbols_amount is None else self.decoded_symbols + symbols_amount
+        while self.__symbols_remaining() and self.decoded_symbols != last_symbol:
+            tree = contexts.get_tree()
+            codeword_start = self.bitstream.position
+            node = tree.root_node_number
+            while tree.left_child[node] >= 0:
+                node = tree.right_child[node] if self.bitstream.read_bit() else tree.left_child[node]
+            codeword_length = self.bitstream.position - codeword_start
+
+            is_new = bool(node == tree.nyt_node)
+            if is_new:
+                symbol = self.bitstream.read_bits(8)
+            else:
+                symbol = int(tree.symbol[node])
+            tree.insert_symbol(symbol)
+            contexts.update_context(symbol)
+
+            if stats is not None:
+                stats.record_symbol(symbol, codeword_length, codeword_length + 8 * is_new, is_new, False)
+            decoded_output[self.decoded_symbols - first_symbol] = symbol
+            self.decoded_symbols += 1
+        return self.decoded_symbols - first_symbol
+
+
     def __read_binary_file(self):
+        # NOTE: The file is memory-mapped, so bits are read straight from the page cache.
         with open(self.binary_path, "rb") as bin_file:
-            str_bitstream = bin_file.read().decode()
-            bool_list = list(map(lambda bit: bool(int(bit)), list(str_bitstream)))
-            self.bitstream = BitStream()
-            self.bitstream.write(bool_list)
+            self.binary_file_map = mmap.mmap(bin_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__decode_header(self.binary_file_map)
 
 
-    def __decode_header(self):
-        ##### Verify if file is image or text.
-        self.image_file = self.bitstream.read(bool, 1)[0]
+    def __decode_header(self, container):
+        ##### Read container header.
+        header = BinaryContainerHeader.unpack(container)
+        self.original_length = header.original_length
+        self.shape = header.shape
+        self.image_file = header.is_image()
+        self.blocks = header.blocks
+        self.predictor = header.predictor
+        self.context_order, self.max_context_trees = header.context_order, header.max_context_trees
+        self.rescale_interval, self.max_weight = header.rescale_interval or None, header.max_weight or None
+        self.snapshot_id = header.snapshot_id
+        self.tree_algorithm = header.tree_algorithm
+        self.static_code = CanonicalHuffmanCode(header.code_lengths) if header.is_static() else None
+        self.__reset_tree()
+        self.__reset_context_trees()
+        self.__reset_lookup_table()
 
-        # TODO: Test image header decoding.
-        if self.image_file:
-            ##### Check if image has 1 or 3 channels.
-            self.three_channel_image = self.bitstream.read(bool, 1)[0]
-            ##### Check if difference is positive
-            positive_difference = self.bitstream.read(bool, 1)[0]
-            ##### Read digits amount in difference value.
-            digits_amount_bool_list = self.bitstream.read(bool, 4)
-            digits_amount = int(self.__convert_bool_list_to_str(digits_amount_bool_list), 2)
-            #### Read difference
-            diff_str = ''
-            for digit in range(digits_amount):
-                digit_bool_list = self.bitstream.read(bool, 4)
-                str_digit = str(int(self.__convert_bool_list_to_str(digit_bool_list)))
-                diff_str += str_digit
-            self.difference = int(diff_str) if positive_difference else (-int(diff_str))
+        ##### The payload starts right after the header and ends before the padding bits.
+        # NOTE: When a seek index is present, it is stored right after the payload.
+        payload_end = header.seek_index_offset if header.seek_index_offset is not None else len(container)
+        self.payload = memoryview(container)[header.get_header_length():payload_end]
+        self.read_payload(self.payload, header.original_length, header.padding_bits)
+
+        ##### Read seek index.
+        if header.seek_index_offset is not None:
+            self.seek_index = SeekIndex.unpack(memoryview(container)[header.seek_index_offset:])
+
+
+    def __decode_symbols_static(self, decoded_output, symbols_amount=None):
+        ##### Static containers always have a header, so the amount of symbols left is known.
+        symbols_left = self.original_length - self.decoded_symbols
+        symbols_amount = symbols_left if symbols_amount is None else min(symbols_amount, symbols_left)
+        decoding_start = time.perf_counter()
+        decoded_bits = self.static_code.decode(self.bitstream, decoded_output, symbols_amount)
+        self.decoded_symbols += symbols_amount
+        if self.stats is not None:
+            self.stats.record_batch(symbols_amount, decoded_bits, 0, time.perf_counter() - decoding_start)
+        return symbols_amount
+
+
+    def __decode_symbols_with_jit(self, decoded_output, symbols_amount=None):
+        import jitkernels
+        ##### Amount of symbols to decode, streams without header are decoded until their bits run out.
+        if symbols_amount is None:
+            symbols_amount = self.bitstream.bits_left() if self.original_length is None else \
+                             self.original_length - self.decoded_symbols
+        elif self.original_length is not None:
+            symbols_amount = min(symbols_amount, self.original_length - self.decoded_symbols)
+
+        tree = self.adaptative_binary_tree
+        buffer = np.frombuffer(self.bitstream.buffer, dtype=np.uint8)
+        output = np.frombuffer(decoded_output, dtype=np.uint8)[:max(symbols_amount, 0)]
+        decoded_symbols = 0
+        while decoded_symbols < len(output):
+            ##### Kernels do not age the tree, so they stop at every rescale.
+            end = len(output)
+            if tree.aging:
+                end = min(end, decoded_symbols + tree.get_symbols_before_rescale())
+
+            tree_arrays = jitkernels.get_tree_arrays(tree)
+            nyt_node, kernel_start = tree.nyt_node, time.perf_counter()
+            kernel_symbols, bit_position = jitkernels.decode_symbols(buffer, self.bitstream.position,
+                                                                     self.bitstream.bit_length,
+                                                                     output[decoded_symbols:end], *tree_arrays)
+            jitkernels.set_tree_scalars(tree, tree_arrays[-1])
+            ##### Kernels only report totals, each new symbol takes two nodes from the NYT node.
+            if self.stats is not None:
+                new_symbols = (nyt_node - tree.nyt_node) // 2
+                self.stats.record_batch(kernel_symbols, bit_position - self.bitstream.position, new_symbols,
+                                        time.perf_counter() - kernel_start)
+
+            ##### Keep the bit reader in sync with the kernel.
+            self.bitstream.seek(bit_position)
+            self.decoded_symbols += kernel_symbols
+            decoded_symbols += kernel_symbols
+            if tree.aging:
+                tree.age_weights(kernel_symbols)
+            ##### Streams without header stop once their bits run out.
+            if decoded_symbols < end:
+                break
+        return decoded_symbols
+
+
+    def __symbols_remaining(self):
+        if self.original_length is None:
+            return self.bitstream.bits_left() > 0
+        return self.decoded_symbols < self.original_length
 
 
     def __save_decoded_file(self):
-        if self.image_file:
-            ##### Get amount of pixels in the image.
-            pixels_array = np.array(self.decoded_bytes)
-            pixels_amount = len(pixels_array)/3 if self.three_channel_image else len(pixels_array)
-            ##### Get image dimensions
-            second_degree_coeff = [1, np.abs(self.difference), -pixels_amount]
-            height = int(np.around(np.roots(second_degree_coeff).max(), 0))
-            width = height + self.difference
-            ##### Reshape Image
-            channels = 3 if self.three_channel_image else 1
-            img = np.squeeze(pixels_array.reshape((height, width, channels)))
-            ##### Include image extension
-            if self.three_channel_image:
-                self.decoded_file_path += '.png' 
-                file_format = 'PNG'
-            else:
-                self.decoded_file_path += '.bmp'
-                file_format = 'BMP' 
-            ##### Save image
-            image = Image.fromarray(img)
-            image.save(self.decoded_file_path, format=file_format)
+        ##### Reshape Image with the dimensions stored in the header.
+        img = np.frombuffer(self.decoded_bytes, dtype=np.uint8).reshape(self.shape)
+        ##### Include image extension
+        if len(self.shape) == 3:
+            self.decoded_file_path += '.png' 
+            file_format = 'PNG'
         else:
-            ##### Convert bytes to string
-            text_string = ''.join([chr(byte) for byte in self.decoded_bytes])
-            ##### Include extension in file path and save file.
-            self.decoded_file_path += '.txt'
-            with open(self.decoded_file_path, "wb") as decoded_file:
-                decoded_file.write(text_string.encode())
-                decoded_file.close()
+            self.decoded_file_path += '.bmp'
+            file_format = 'BMP' 
+        ##### Save image
+        from PIL import Image
+        image = Image.fromarray(img)
+        image.save(self.decoded_file_path, format=file_format)
 
 
     def __print_process_duration(self, starting_time, ending_time, process_name):
@@ -164,9 +562,18 @@ class HuffmanDecoder():
         print(process_name + ' took ' + hours_string + minutes_string + seconds_string + '.')
 
 
-    def __convert_bool_list_to_str(self, bool_list):
-        bs = ''.join(['1' if bit == True else '0' for bit in bool_list])
-        return bs
+
+def decode_block(payload, original_length, padding_bits, symbols_amount, lookup_bits, use_jit=False, context_order=0,
+                 max_context_trees=None, rescale_interval=None, max_weight=None, snapshot_id=None,
+                 snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY, tree_algorithm='fgk'):
+    ##### Decode block with its own tree, as a process pool task.
+    decoder = HuffmanDecoder(symbols_amount=symbols_amount, lookup_bits=lookup_bits, use_jit=use_jit,
+                             context_order=context_order, max_context_trees=max_context_trees,
+                             rescale_interval=rescale_interval, max_weight=max_weight, snapshot_id=snapshot_id,
+                             snapshot_directory=snapshot_directory, tree_algorithm=tree_algorithm)
+    decoder.read_payload(payload, original_length, padding_bits)
+    decoder.decode_with_adaptative_hc(verbose=False)
+    return decoder.decoded_bytes
 
 
 
@@ -177,9 +584,28 @@ if __name__ == "__main__":
     parser.add_argument('--binary_file', required=True, help='Path to binary file.')
     parser.add_argument('--decoded_file_path', required=False, help="Path to save decoded file. "
                                                    "If folders do not exist, they'll be created.")
+    parser.add_argument('--chunk_size', required=False, type=int, help="Decode and write blocks of this many "
+                                                                       "symbols with bounded memory.")
+    parser.add_argument('--workers', required=False, type=int, help="Amount of processes used to decode "
+                                                                    "block-coded files. Defaults to the CPU cores.")
+    parser.add_argument('--jit', action='store_true', help="Decode with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+    parser.add_argument('--start', required=False, type=int, help="First symbol of the range to be decoded. "
+                                                                  "Only this range is written to the decoded file.")
+    parser.add_argument('--end', required=False, type=int, help="Symbol after the end of the range to be decoded. "
+                                                                "Defaults to the end of the file.")
+    parser.add_argument('--stats', action='store_true', help="Print symbol, bit and tree update counters "
+                                                             "and the time spent in each decoding phase.")
+    parser.add_argument('--stats_sample', required=False, type=int, default=1,
+                        help="Time only one symbol out of this many. Counters stay exact.")
+    parser.add_argument('--progress', action='store_true', help="Show a progress bar.")
+    parser.add_argument('--snapshot_directory', required=False, default=DEFAULT_SNAPSHOT_DIRECTORY,
+                        help="Directory holding the tree snapshots referenced by binary files.")
 
     ##### Read command line
     args = parser.parse_args(sys.argv[1:])
+    if args.stats_sample < 1:
+        parser.error("--stats_sample must be at least 1.")
     
     ##### Define directory path.
     if args.decoded_file_path:
@@ -194,5 +620,19 @@ if __name__ == "__main__":
         directory.mkdir(parents=True)
     
     ##### Decode binary.
-    decoder = HuffmanDecoder(args.binary_file, args.decoded_file_path)
-    decoder.decode_binary()
\ No newline at end of file
+    # NOTE: Progress is reported through the stats hooks, so it also enables the counters.
+    stats = CodingStats(args.stats_sample) if (args.stats or args.progress) else None
+    if args.progress:
+        stats.add_hook('progress', make_progress_hook("Decoding Progress"))
+    decoder = HuffmanDecoder(args.binary_file, args.decoded_file_path, workers=args.workers, use_jit=args.jit,
+                             stats=stats, snapshot_directory=args.snapshot_directory)
+    if args.start is not None or args.end is not None:
+        decoded_range = decoder.decode_range(args.start or 0, args.end if args.end is not None else sys.maxsize)
+        with open(args.decoded_file_path + '.txt', "wb") as decoded_file:
+            decoded_file.write(decoded_range)
+    elif args.chunk_size:
+        decoder.decode_binary_in_chunks(args.chunk_size)
+    else:
+        decoder.decode_binary()
+    if args.stats:
+        decoder.stats.print_report()
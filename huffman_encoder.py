@@ -1,26 +1,114 @@
 import os
 import sys
-import cv2
+import mmap
 import time
 import argparse
 import numpy as np
 
-from PIL import Image
-from tqdm import tqdm
 from pathlib import Path
-from bitstream import BitStream
+from itertools import repeat
 
-from adaptativebinarytree import AdaptativeBinaryTree
+from bitwriter import BitWriter
+from codingstats import CodingStats, make_progress_hook
+from entropystatistics import EntropyStatistics, calculate_entropy
+from adaptativebinarytree import AdaptativeBinaryTree, TREE_ALGORITHMS
+from contexttrees import ContextTreeCache
+from binarycontainer import BinaryContainerHeader, SeekIndex
+from imagepredictors import PREDICTORS, apply_predictor
+from treesnapshots import DEFAULT_SNAPSHOT_DIRECTORY, load_snapshot
+from canonicalcodes import CanonicalHuffmanCode
+
+
+# NOTE: Adaptive trees are updated after every symbol. The static mode reads the source twice, once to build
+# a canonical code from its histogram and once to write the codewords, and only stores code lengths.
+CODING_MODES = ('adaptive', 'static')
 
 
 class HuffmanEncoder():
 
-    def __init__(self, source_path=None, bitstream_path=None, symbols_amount=2**8):
+    def __init__(self, source_path=None, bitstream_path=None, symbols_amount=2**8, seek_interval=None, use_jit=False,
+                 stats=None, image_source=False, context_order=0, context_memory=2**26, rescale_interval=None,
+                 max_weight=None, snapshot_id=None, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY,
+                 entropy_statistics=None, mode='adaptive', tree_algorithm='fgk'):
         self.source_path = source_path
         self.bitstream_path = bitstream_path
+        # NOTE: Sources are coded as raw bytes, images are only decoded into pixels when requested.
+        self.image_source = image_source
+
+        ##### Coding mode, see CODING_MODES.
+        # NOTE: The static code is built from the whole source, so it has no tree to index, age, prime or select
+        # by context, and it can not be coded in chunks or blocks.
+        if mode not in CODING_MODES:
+            raise ValueError(f"Unknown coding mode: {mode}.")
+        if mode == 'static' and (seek_interval or context_order or rescale_interval or max_weight or
+                                 snapshot_id is not None or tree_algorithm != 'fgk'):
+            raise ValueError("Static mode can not be combined with a seek index, context mode, weight aging, "
+                             "a tree snapshot or a tree algorithm.")
+        self.mode = mode
         
         # NOTE: It will be adopted as standard to use bytes as symbols.
-        self.adaptative_binary_tree = AdaptativeBinaryTree(symbols_amount)
+        self.symbols_amount = symbols_amount
+        # NOTE: Every tree (blocks, channels and contexts included) follows the same update algorithm.
+        self.tree_algorithm = tree_algorithm
+        self.adaptative_binary_tree = AdaptativeBinaryTree(symbols_amount, tree_algorithm)
+        # NOTE: Bits already packed and handed out by the chunked encoding.
+        self.flushed_bits = 0
+
+        ##### Optional seek index, with a checkpoint every seek_interval symbols.
+        # NOTE: Denser indexes make partial decoding start closer to the requested range, at the cost of file size.
+        self.seek_interval = seek_interval
+        self.seek_index = SeekIndex(seek_interval) if seek_interval else None
+        self.encoded_symbols = 0
+
+        ##### Optional weight aging, halving tree weights so that recent symbols weigh more on drifting sources.
+        self.rescale_interval = rescale_interval
+        self.max_weight = max_weight
+        self.adaptative_binary_tree.set_aging(rescale_interval, max_weight)
+
+        ##### Optional priming, starting from a trained tree instead of a NYT-only one.
+        # NOTE: Short sources then skip most NYT escapes. The decoder finds the same snapshot from its identifier.
+        self.snapshot_id = snapshot_id
+        self.snapshot_directory = snapshot_directory
+        self.snapshot_state = None
+        if snapshot_id is not None:
+            self.snapshot_state = load_snapshot(snapshot_id, symbols_amount, snapshot_directory)
+            self.adaptative_binary_tree.load_state(self.snapshot_state)
+
+        ##### Optional context mode, with one tree for each context of context_order previous symbols.
+        # NOTE: Live trees are bounded by context_memory bytes, the least recently used ones are dropped.
+        self.context_order = context_order
+        self.context_memory = context_memory
+        self.context_trees = None
+        if context_order:
+            if self.seek_index is not None:
+                raise ValueError("Context mode can not be combined with a seek index.")
+            self.max_context_trees = ContextTreeCache.get_max_trees(symbols_amount, context_memory)
+            self.context_trees = ContextTreeCache(symbols_amount, context_order, self.max_context_trees,
+                                                  rescale_interval=rescale_interval, max_weight=max_weight,
+                                                  initial_state=self.snapshot_state, tree_algorithm=tree_algorithm)
+
+        # NOTE: The Numba kernels produce the same bits as the Python loop. Without Numba, the Python loop is used.
+        # The kernels work on a single tree, so the context mode always runs in Python.
+        # Numba is only imported when the kernels are requested, since it takes longer to load than most files to code.
+        self.use_jit = False
+        if use_jit and not context_order:
+            import jitkernels
+            self.use_jit = jitkernels.NUMBA_AVAILABLE
+
+        ##### Optional instrumentation, shared with the tree.
+        self.set_stats(stats)
+
+        ##### Optional entropy statistics, updated with the symbols as they are coded.
+        # NOTE: The achieved rate is then compared with the entropy bounds without reading the source twice.
+        self.entropy_statistics = entropy_statistics
+
+
+    def set_stats(self, stats):
+        # NOTE: Without stats, the plain coding loops run and no counter or timer is touched.
+        self.stats = stats
+        self.adaptative_binary_tree.set_stats(stats)
+        if self.context_trees is not None:
+            self.context_trees.set_stats(stats)
 
 
     def encode_source(self):
@@ -35,121 +123,412 @@ class HuffmanEncoder():
         ##### Save binary file
         self.__save_binary_file()
 
+
+    def encode_source_in_chunks(self, chunk_size=2**16):
+        # NOTE: The source is read as raw bytes, chunk by chunk, so memory usage does not depend on its size.
+        if self.image_source:
+            raise ValueError("Images are decoded as a whole before coding their pixels, so they can not be "
+                             "coded in chunks.")
+        if self.stats is not None:
+            self.stats.total_symbols = os.path.getsize(self.source_path)
+        with open(self.source_path, "rb") as source, open(self.bitstream_path, "wb") as bin_file:
+            ##### The header is rewritten at the end, once length and padding are known.
+            bin_file.write(self.start_chunked_encoding())
+            for chunk in iter(lambda: source.read(chunk_size), b''):
+                bin_file.write(self.encode_chunk(np.frombuffer(chunk, dtype=np.uint8)))
+            bin_file.write(self.finish_chunked_encoding())
+            if self.stats is not None:
+                self.stats.fire_progress()
+            bin_file.seek(0)
+            bin_file.write(self.header.pack())
+
+
+    def encode_source_in_blocks(self, block_size, workers=None):
+        ##### Get info about the source
+        self.__get_source_info_from_file()
+        ##### Encode source split in independent blocks.
+        self.encode_blocks(block_size, workers)
+        ##### Save binary file
+        self.__save_binary_file()
+
+
+    def encode_source_in_channels(self, predictor='left', workers=None):
+        ##### Get info about the source
+        self.__get_source_info_from_file()
+        ##### Encode each image channel with its own tree.
+        self.encode_channels(predictor, workers)
+        ##### Save binary file
+        self.__save_binary_file()
+
+
+    def encode_blocks(self, block_size, workers=None):
+        blocks = [self.byte_array[start:start + block_size] for start in range(0, len(self.byte_array), block_size)]
+        if self.entropy_statistics is not None:
+            self.entropy_statistics.update(self.byte_array)
+        self.__encode_independent_blocks(blocks, workers)
+
+
+    def encode_channels(self, predictor='left', workers=None):
+        # NOTE: Channels have different statistics, so each one gets its own tree. Pixels are replaced
+        # by their difference to a neighbour, whose distribution is much narrower in natural images.
+        if self.shape is None:
+            raise ValueError("Planar mode is only available for images.")
+        image = np.asarray(self.byte_array, dtype=np.uint8).reshape(self.shape[0], self.shape[1], -1)
+        predictor_id = PREDICTORS[predictor]
+        channels = [apply_predictor(np.ascontiguousarray(image[:, :, channel]), predictor_id).reshape(-1)
+                    for channel in range(image.shape[2])]
+        self.__encode_independent_blocks(channels, workers)
+        if self.entropy_statistics is not None:
+            self.entropy_statistics.update(self.byte_array)
+        self.header.predictor = predictor_id
+        self.header_length = self.header.get_header_length() * 8
+
+
+    def start_chunked_encoding(self, shape=None):
+        ##### Instantiate bitstream and a header without any symbol.
+        if self.mode == 'static':
+            raise ValueError("Static mode needs the whole source to build its code, it can not be coded in chunks.")
+        self.instantiate_bitstream()
+        self.byte_array = np.array([], dtype=np.uint8)
+        self.shape = shape
+        self.__encode_header()
+        self.flushed_bits = 0
+        return self.header.pack()
+
+
+    def encode_chunk(self, chunk):
+        ##### Encode chunk with the tree left by the previous chunks.
+        if self.use_jit:
+            self.__encode_symbols_with_jit(chunk)
+        else:
+            self.__encode_symbols(chunk)
+        if self.entropy_statistics is not None:
+            self.entropy_statistics.update(chunk)
+        self.header.original_length += len(chunk)
+        ##### Hand out every complete byte, keeping the remaining bits for the next chunk.
+        complete_bytes = self.bitstream.flush_bytes()
+        self.flushed_bits += 8 * len(complete_bytes)
+        return complete_bytes
+
+
+    def encode_frame(self, chunk):
+        ##### Encode chunk and pad its last byte, so that the frame can be decoded as soon as it is received.
+        # NOTE: Padding costs up to 7 bits per frame. The tree is carried over to the next frame.
+        complete_bytes = self.encode_chunk(chunk)
+        self.bitstream.write(0, self.bitstream.get_padding_bits())
+        padded_bytes = self.bitstream.flush_bytes()
+        self.flushed_bits += 8 * len(padded_bytes)
+        return complete_bytes + padded_bytes
+
+
+    def finish_chunked_encoding(self):
+        ##### Pad the remaining bits up to a complete byte.
+        payload = self.get_payload_bytes()
+        payload_offset = self.header.get_header_length() + self.flushed_bits // 8
+        return payload + self.__pack_seek_index(payload_offset + len(payload))
+
     
-    def read_sequence_array(self, sequence):
+    def read_sequence_array(self, sequence, shape=None):
+        ##### Bytes-like objects (bytes, bytearray, memoryview, mmap) are viewed as symbols without copying.
+        if isinstance(sequence, (bytes, bytearray, memoryview, mmap.mmap)):
+            sequence = np.frombuffer(sequence, dtype=np.uint8)
         self.byte_array = sequence
+        self.shape = shape
+        self.__encode_header()
 
     
     def instantiate_bitstream(self):
-        self.bitstream = BitStream()
+        self.bitstream = BitWriter()
 
     def get_binary_string(self):
-        return self.bitstream.__str__()
+        return self.bitstream.get_bit_string()
+
+
+    def get_packed_bytes(self):
+        return b''.join(self.__get_container_parts())
+
+
+    def get_payload_bytes(self):
+        ##### Coded bits are packed 8 per byte, with the last byte padded with zeros.
+        self.header.padding_bits = self.bitstream.get_padding_bits()
+        return bytes(self.bitstream.get_buffer())
 
 
     def show_average_rate(self):
+        payload_length = self.flushed_bits + self.bitstream.get_bit_length()
+        bitstream_length = self.header_length + payload_length
         ##### Show entire bitstream length
-        print(f"Bitstream length: {len(self.bitstream.__str__())} bits;")
+        print(f"Bitstream length: {bitstream_length} bits;")
         ##### Show entire bitstream without header
-        print(f"Bitstream length without header: {len(self.bitstream.__str__()) - self.header_length} bits;")
+        print(f"Bitstream length without header: {payload_length} bits;")
         ##### Compute Average Rate
-        bitstream_length = len(self.bitstream.__str__())
-        symbols_encoded = len(self.byte_array)
-        mean_rate = bitstream_length/symbols_encoded
+        symbols_encoded = self.header.original_length
+        mean_rate = bitstream_length/symbols_encoded if symbols_encoded else 0
         print(f"Average rate: {mean_rate:.5f} bits per symbol.")
+        ##### Context mode gains are measured against the order-0 entropy of the source.
+        if self.context_trees is not None and self.context_trees.created_trees:
+            print(f"Context trees: {len(self.context_trees.trees)} alive, {self.context_trees.created_trees} created "
+                  f"and {self.context_trees.evicted_trees} evicted.")
+            if self.entropy_statistics is None and symbols_encoded and len(self.byte_array) == symbols_encoded:
+                order_0_entropy = calculate_entropy(np.bincount(self.byte_array, minlength=self.symbols_amount))
+                print(f"Order-0 entropy: {order_0_entropy:.5f} bits per symbol.")
+        ##### Entropy bounds of the coded symbols, gathered while coding them.
+        if self.entropy_statistics is not None:
+            self.entropy_statistics.print_report()
 
 
     def encode_with_adaptative_hc(self, verbose=True):
-        ##### Define Auxiliary Function.
-        def convert_string_to_boolean_list(string):
-            bool_list = list(map(lambda bit: bool(int(bit)), list(string)))
-            return bool_list
-
         ##### Measure encoding time.
         encoding_start = time.time()
 
-        ##### Encode first symbol
-        self.adaptative_binary_tree.insert_symbol(self.byte_array[0])
-        self.bitstream.write(self.byte_array[0], np.uint8)
-        ##### Encode remaining bitstream.
-        iterator = tqdm(self.byte_array[1:], desc="Encoding Progress") if verbose else self.byte_array[1:]
-        for byte in iterator:
+        ##### Encode bitstream.
+        if self.stats is not None:
+            self.stats.total_symbols = len(self.byte_array)
+        if self.mode == 'static':
+            self.__encode_symbols_static(self.byte_array)
+        elif self.use_jit:
+            self.__encode_symbols_with_jit(self.byte_array)
+        else:
+            self.__encode_symbols(self.byte_array)
+        if self.entropy_statistics is not None:
+            self.entropy_statistics.update(self.byte_array)
+
+        encoding_finish = time.time()
+        if self.stats is not None:
+            self.stats.fire_progress()
+        if verbose:
+            self.__print_process_duration(encoding_start, encoding_finish, "Encoding Process")
+        
+    
+    ########## Private Methods
+    def __encode_independent_blocks(self, blocks, workers=None):
+        # NOTE: Every block is coded with a fresh tree in a separate process,
+        # so blocks can also be decoded independently and in parallel.
+        if self.seek_index is not None:
+            raise ValueError("Block mode can not be combined with a seek index, blocks are already decoded independently.")
+        if self.mode == 'static':
+            raise ValueError("Block mode can only be combined with the adaptive mode.")
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            encoded_blocks = list(executor.map(encode_block, blocks, repeat(self.symbols_amount), repeat(self.use_jit),
+                                               repeat(self.context_order), repeat(self.context_memory),
+                                               repeat(self.rescale_interval), repeat(self.max_weight),
+                                               repeat(self.snapshot_id), repeat(self.snapshot_directory),
+                                               repeat(self.tree_algorithm)))
+
+        ##### Build block table, with offsets relative to the beginning of the payload.
+        block_table, offset = [], 0
+        for block, (payload, padding_bits) in zip(blocks, encoded_blocks):
+            block_table.append((offset, len(block), padding_bits))
+            offset += len(payload)
+
+        self.__encode_header()
+        self.header.blocks = block_table
+        self.header_length = self.header.get_header_length() * 8
+        self.instantiate_bitstream()
+        self.block_payloads = [payload for payload, _ in encoded_blocks]
+        self.flushed_bits = 8 * offset
+
+
+    def __encode_symbols(self, symbols):
+        if self.context_trees is not None:
+            self.__encode_symbols_with_contexts(symbols)
+            return
+        if self.stats is not None:
+            self.__encode_symbols_with_stats(symbols)
+            return
+
+        for byte in symbols:
+            ##### Record a checkpoint every seek_interval symbols.
+            if self.seek_index is not None and self.encoded_symbols and self.encoded_symbols % self.seek_interval == 0:
+                self.__add_checkpoint()
             ##### Get symbol codeword
             byte_codeword = self.adaptative_binary_tree.get_symbol_codeword(byte)
             ##### If symbol is new, codeword for NYT and symbol's byte should be sent.
+            # NOTE: While the tree is empty, the NYT codeword has no bits and only the byte is sent.
             if byte_codeword is None:
-                nyt_codeword = self.adaptative_binary_tree.get_codeword_for_nyt()
-                self.bitstream.write(convert_string_to_boolean_list(nyt_codeword))
-                self.bitstream.write(byte, np.uint8)
+                nyt_codeword, nyt_codeword_length = self.adaptative_binary_tree.get_codeword_for_nyt()
+                self.bitstream.write(nyt_codeword, nyt_codeword_length)
+                self.bitstream.write(int(byte), 8)
             ##### If symbol exists, send its codeword.
             else:
-                self.bitstream.write(convert_string_to_boolean_list(byte_codeword))
+                self.bitstream.write(*byte_codeword)
             ##### After getting the codeword, update Tree.
             self.adaptative_binary_tree.insert_symbol(byte)
+            self.encoded_symbols += 1
+
+
+    def __encode_symbols_with_stats(self, symbols):
+        ##### Same loop as __encode_symbols, timing each phase of the sampled symbols.
+        tree, stats = self.adaptative_binary_tree, self.stats
+        for byte in symbols:
+            if self.seek_index is not None and self.encoded_symbols and self.encoded_symbols % self.seek_interval == 0:
+                self.__add_checkpoint()
+
+            sampled = stats.is_sampled()
+            if sampled:
+                lookup_start = time.perf_counter()
+            byte_codeword = tree.get_symbol_codeword(byte)
+            is_new = byte_codeword is None
+            if is_new:
+                byte_codeword = tree.get_codeword_for_nyt()
+            if sampled:
+                output_start = time.perf_counter()
+            self.bitstream.write(*byte_codeword)
+            if is_new:
+                self.bitstream.write(int(byte), 8)
+            if sampled:
+                update_start = time.perf_counter()
+            tree.insert_symbol(byte)
+            if sampled:
+                update_finish = time.perf_counter()
+                stats.add_phase_time('codeword lookup', output_start - lookup_start)
+                stats.add_phase_time('bit output', update_start - output_start)
+                stats.add_phase_time('tree update', update_finish - update_start)
+
+            codeword_length = byte_codeword[1]
+            stats.record_symbol(int(byte), codeword_length, codeword_length + 8 * is_new, is_new, sampled)
+            self.encoded_symbols += 1
+
+
+    def __encode_symbols_with_contexts(self, symbols):
+        ##### Same loop as __encode_symbols, coding each symbol with the tree of its context.
+        contexts, stats = self.context_trees, self.stats
+        for byte in symbols:
+            tree = contexts.get_tree()
+            byte_codeword = tree.get_symbol_codeword(byte)
+            is_new = byte_codeword is None
+            if is_new:
+                byte_codeword = tree.get_codeword_for_nyt()
+            self.bitstream.write(*byte_codeword)
+            if is_new:
+                self.bitstream.write(int(byte), 8)
+            tree.insert_symbol(byte)
+            contexts.update_context(int(byte))
+
+            if stats is not None:
+                codeword_length = byte_codeword[1]
+                stats.record_symbol(int(byte), codeword_length, codeword_length + 8 * is_new, is_new, False)
+            self.encoded_symbols += 1
+
+
+    def __encode_symbols_static(self, symbols):
+        ##### First pass builds the code from the histogram of the source, the second one writes the codewords.
+        coding_start = time.perf_counter()
+        static_code = CanonicalHuffmanCode.from_symbols(symbols, self.symbols_amount)
+        self.header.code_lengths = static_code.code_lengths.tolist()
+        self.header_length = self.header.get_header_length() * 8
+        initial_bits = self.bitstream.get_bit_length()
+        static_code.encode(symbols, self.bitstream)
+        self.encoded_symbols += len(symbols)
+        if self.stats is not None:
+            self.stats.record_batch(len(symbols), self.bitstream.get_bit_length() - initial_bits, 0,
+                                    time.perf_counter() - coding_start)
+
+
+    def __encode_symbols_with_jit(self, symbols):
+        import jitkernels
+        symbols = np.asarray(symbols)
+        tree_arrays = jitkernels.get_tree_arrays(self.adaptative_binary_tree)
+        # NOTE: Output buffers hold two bytes per symbol, the kernel stops early if one gets full.
+        output = np.empty(2 * len(symbols) + 2 * self.adaptative_binary_tree.root_node_number, dtype=np.uint8)
+
+        start = 0
+        while start < len(symbols):
+            ##### Stop at every checkpoint of the seek index.
+            end = len(symbols)
+            if self.seek_index is not None:
+                if self.encoded_symbols and self.encoded_symbols % self.seek_interval == 0:
+                    self.__add_checkpoint()
+                end = min(end, start + self.seek_interval - self.encoded_symbols % self.seek_interval)
+            ##### Kernels do not age the tree, so they also stop at every rescale.
+            if self.adaptative_binary_tree.aging:
+                end = min(end, start + self.adaptative_binary_tree.get_symbols_before_rescale())
+
+            nyt_node, kernel_start = self.adaptative_binary_tree.nyt_node, time.perf_counter()
+            encoded_symbols, bytes_written, emitted_bits, pending_bits, pending_length = \
+                jitkernels.encode_symbols(symbols[start:end], output, *tree_arrays)
+            jitkernels.set_tree_scalars(self.adaptative_binary_tree, tree_arrays[-1])
+            ##### Kernels only report totals, each new symbol takes two nodes from the NYT node.
+            if self.stats is not None:
+                new_symbols = (nyt_node - self.adaptative_binary_tree.nyt_node) // 2
+                self.stats.record_batch(encoded_symbols, emitted_bits, new_symbols, time.perf_counter() - kernel_start)
+
+            ##### Write complete bytes, then the bits left in the kernel.
+            self.bitstream.write_bytes(output[:bytes_written])
+            self.bitstream.write(int(pending_bits), int(pending_length))
+            self.encoded_symbols += encoded_symbols
+            start += encoded_symbols
+            if self.adaptative_binary_tree.aging:
+                self.adaptative_binary_tree.age_weights(encoded_symbols)
+                tree_arrays = jitkernels.get_tree_arrays(self.adaptative_binary_tree)
+
+
+    def __add_checkpoint(self):
+        self.seek_index.add_checkpoint(self.flushed_bits + self.bitstream.get_bit_length(),
+                                       self.encoded_symbols, self.adaptative_binary_tree.serialize_state())
+
+
+    def __pack_seek_index(self, seek_index_offset):
+        if self.seek_index is None:
+            return b''
+        self.header.seek_index_offset = seek_index_offset
+        return self.seek_index.pack()
+
+
+    def __get_container_parts(self):
+        if self.header.blocks is not None:
+            return [self.header.pack()] + self.block_payloads
+        ##### The payload is handed out without copying the writer buffer.
+        payload = self.bitstream.get_buffer()
+        self.header.padding_bits = self.bitstream.get_padding_bits()
+        seek_index = self.__pack_seek_index(self.header.get_header_length() + len(payload))
+        return [self.header.pack(), payload, seek_index]
+
 
-        encoding_finish = time.time()
-        if verbose:
-            self.__print_process_duration(encoding_start, encoding_finish, "Encoding Process")
-        
-    
-    ########## Private Methods
     def __get_source_info_from_file(self):
-        # NOTE: Two approaches will be adopted for reading images and text files.
-        ##### Trying to read as text:
-        try:
-            with open(self.source_path) as source:
-                source_string = source.read()
-                source_bytes = bytes(source_string, source.encoding)
-                self.byte_array = np.frombuffer(source_bytes, dtype=np.uint8)
-                self.shape = None
-
-        ##### Handle except if image is received.
-        except UnicodeDecodeError:
+        ##### Images are decoded into their pixels, with their dimensions.
+        if self.image_source:
+            from PIL import Image
             image_array = np.array(Image.open(self.source_path))
             self.shape = image_array.shape
             self.byte_array = image_array.flatten()
+            return
+
+        ##### Any other file is memory-mapped and coded byte by byte, exactly as stored.
+        # NOTE: The map stays open while the encoder holds a view of it. Empty files can not be mapped.
+        self.shape = None
+        with open(self.source_path, "rb") as source:
+            if os.fstat(source.fileno()).st_size == 0:
+                self.byte_array = np.array([], dtype=np.uint8)
+                return
+            self.source_map = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        self.byte_array = np.frombuffer(self.source_map, dtype=np.uint8)
 
 
     def __encode_header(self):
-        ##### Define Auxiliary Function.
-        def get_bool_list(value):
-            bit_list = list('{0:04b}'.format(value))
-            bool_list = list(map(lambda bit: True if bit == '1' else False, bit_list))
-            return bool_list
-
-        # NOTE: A flag is required to indicate whether it is an image.
-        image_file = True if self.shape else False
-        self.bitstream.write(image_file)
-
-        ##### Image header.
-        if image_file:
-            # NOTE: The next flag will indicate if the image has 1 or 3 channels.
-            three_channel_image = True if (len(self.shape) == 3) and (self.shape[-1] == 3) else False
-            self.bitstream.write(three_channel_image)
-
-            # NOTE: If the source is an image, the decoder needs to know its format. 
-            # Instead of sending the whole dimensions, it will send the difference between width and height.
-            height, width = self.shape[:2]
-            dimension_difference = width - height
-            positive_difference = True if dimension_difference >= 0 else False
-            self.bitstream.write(positive_difference)
-            dimension_difference = np.abs(dimension_difference) 
-            difference_digits = list(str(dimension_difference))
-            
-            # NOTE: The amount of digits and the digit will be written with 4 bits.
-            self.bitstream.write(get_bool_list(len(difference_digits)))
-            for digit in difference_digits:
-                self.bitstream.write(get_bool_list(int(digit)))
+        # NOTE: The header stores the amount of symbols, so the decoder knows when to stop,
+        # and the exact image dimensions when the source is an image.
+        self.header = BinaryContainerHeader(original_length=len(self.byte_array), shape=self.shape)
+        # NOTE: The seek index offset is only known after the payload, its field is reserved here.
+        if self.seek_index is not None:
+            self.header.seek_index_offset = 0
+        if self.context_trees is not None:
+            self.header.context_order = self.context_order
+            self.header.max_context_trees = self.max_context_trees
+        self.header.rescale_interval = self.rescale_interval or 0
+        self.header.max_weight = self.max_weight or 0
+        self.header.snapshot_id = self.snapshot_id
+        self.header.tree_algorithm = self.tree_algorithm
 
         ##### Get header length
-        self.header_length = len(self.bitstream.__str__())
+        self.header_length = self.header.get_header_length() * 8
 
 
     def __save_binary_file(self):
         with open(self.bitstream_path, "wb") as bin_file:
-            binary_string = get_binary_string()
-            bin_file.write(binary_string.encode())
-            bin_file.close()
+            for container_part in self.__get_container_parts():
+                bin_file.write(container_part)
 
 
     def __print_process_duration(self, starting_time, ending_time, process_name):
@@ -172,6 +551,21 @@ class HuffmanEncoder():
 
 
 
+def encode_block(block, symbols_amount, use_jit=False, context_order=0, context_memory=2**26, rescale_interval=None,
+                 max_weight=None, snapshot_id=None, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY,
+                 tree_algorithm='fgk'):
+    ##### Encode block with its own tree, as a process pool task.
+    encoder = HuffmanEncoder(symbols_amount=symbols_amount, use_jit=use_jit, context_order=context_order,
+                             context_memory=context_memory, rescale_interval=rescale_interval, max_weight=max_weight,
+                             snapshot_id=snapshot_id, snapshot_directory=snapshot_directory,
+                             tree_algorithm=tree_algorithm)
+    encoder.instantiate_bitstream()
+    encoder.read_sequence_array(block)
+    encoder.encode_with_adaptative_hc(verbose=False)
+    return encoder.get_payload_bytes(), encoder.header.padding_bits
+
+
+
 if __name__ == "__main__":
     ##### Receives file to be compressed from command line.
     parser = argparse.ArgumentParser(description="Receives file to be encoded and binary filepath.")
@@ -179,9 +573,52 @@ if __name__ == "__main__":
     parser.add_argument('--file_to_compress', required=True, help='Path to file to be compressed.')
     parser.add_argument('--binary_file_path', required=False, help="Path to save binary file. "
                                                                    "If folders do not exist, they'll be created.")
+    parser.add_argument('--mode', required=False, choices=CODING_MODES, default='adaptive',
+                        help="Adaptive trees, or a static canonical code built from a first pass over the source.")
+    parser.add_argument('--tree', required=False, choices=TREE_ALGORITHMS, default='fgk',
+                        help="Update algorithm of the adaptive trees, FGK or Vitter's algorithm Lambda.")
+    parser.add_argument('--chunk_size', required=False, type=int, help="Encode the file as raw bytes, reading "
+                                                                       "blocks of this many bytes with bounded memory.")
+    parser.add_argument('--block_size', required=False, type=int, help="Split the source in independent blocks "
+                                                                       "of this many symbols, coded in parallel.")
+    parser.add_argument('--workers', required=False, type=int, help="Amount of processes used by the block mode. "
+                                                                    "Defaults to the amount of CPU cores.")
+    parser.add_argument('--jit', action='store_true', help="Encode with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+    parser.add_argument('--seek_interval', required=False, type=int, help="Write a seek index with a checkpoint "
+                                                                          "every this many symbols.")
+    parser.add_argument('--image', action='store_true', help="Decode the source as an image and code its pixels. "
+                                                             "Otherwise, the file is coded as raw bytes.")
+    parser.add_argument('--planar', action='store_true', help="Code each image channel with its own tree, "
+                                                              "in parallel processes. Implies --image.")
+    parser.add_argument('--predictor', required=False, choices=list(PREDICTORS), default='left',
+                        help="Pixel predictor used by the planar mode.")
+    parser.add_argument('--context_order', required=False, type=int, default=0,
+                        help="Code each symbol with a tree selected by this many previous symbols.")
+    parser.add_argument('--context_memory', required=False, type=float, default=64,
+                        help="Memory budget for the context trees, in MB. Least recently used trees are dropped.")
+    parser.add_argument('--rescale_interval', required=False, type=int,
+                        help="Halve the tree weights every this many symbols, favouring recent statistics.")
+    parser.add_argument('--max_weight', required=False, type=int,
+                        help="Halve the tree weights whenever the root weight reaches this value.")
+    parser.add_argument('--snapshot', required=False, type=lambda value: int(value, 16),
+                        help="Identifier (hexadecimal) of the tree snapshot every tree starts from.")
+    parser.add_argument('--snapshot_directory', required=False, default=DEFAULT_SNAPSHOT_DIRECTORY,
+                        help="Directory holding the tree snapshots.")
+    parser.add_argument('--stats', action='store_true', help="Print symbol, bit and tree update counters "
+                                                             "and the time spent in each coding phase.")
+    parser.add_argument('--stats_sample', required=False, type=int, default=1,
+                        help="Time only one symbol out of this many. Counters stay exact.")
+    parser.add_argument('--progress', action='store_true', help="Show a progress bar.")
+    parser.add_argument('--entropy_order', required=False, type=int, help="Report the order-0 up to this order "
+                                                                          "conditional entropy of the coded symbols.")
 
     ##### Read command line
     args = parser.parse_args(sys.argv[1:])
+    if args.stats_sample < 1:
+        parser.error("--stats_sample must be at least 1.")
+    if args.image and args.chunk_size and not args.planar:
+        parser.error("--chunk_size codes the file as raw bytes and can not be combined with --image.")
     
     ##### Define directory path.
     if args.binary_file_path:
@@ -196,6 +633,25 @@ if __name__ == "__main__":
         directory.mkdir(parents=True)
     
     ##### Encode source.
-    encoder = HuffmanEncoder(args.file_to_compress, args.binary_file_path)
-    encoder.encode_source()
-    encoder.show_average_rate()
\ No newline at end of file
+    # NOTE: Progress is reported through the stats hooks, so it also enables the counters.
+    stats = CodingStats(args.stats_sample) if (args.stats or args.progress) else None
+    if args.progress:
+        stats.add_hook('progress', make_progress_hook("Encoding Progress"))
+    entropy_statistics = EntropyStatistics(args.entropy_order) if args.entropy_order is not None else None
+    encoder = HuffmanEncoder(args.file_to_compress, args.binary_file_path, seek_interval=args.seek_interval,
+                             use_jit=args.jit, stats=stats, image_source=args.image or args.planar,
+                             context_order=args.context_order, context_memory=int(args.context_memory * 2**20),
+                             rescale_interval=args.rescale_interval, max_weight=args.max_weight,
+                             snapshot_id=args.snapshot, snapshot_directory=args.snapshot_directory,
+                             entropy_statistics=entropy_statistics, mode=args.mode, tree_algorithm=args.tree)
+    if args.planar:
+        encoder.encode_source_in_channels(args.predictor, args.workers)
+    elif args.block_size:
+        encoder.encode_source_in_blocks(args.block_size, args.workers)
+    elif args.chunk_size:
+        encoder.encode_source_in_chunks(args.chunk_size)
+    else:
+        encoder.encode_source()
+    encoder.show_average_rate()
+    if args.stats:
+        encoder.stats.print_report()
\ No newline at end of file
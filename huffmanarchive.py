@@ -0,0 +1,234 @@
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import zlib
+import struct
+import argparse
+import numpy as np
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+from entropystatistics import EntropyStatistics
+
+
+# NOTE: Archive layout (little-endian): magic (4s), version (B), amount of files (I) and table of contents offset (Q),
+# then the coded files, each one a complete container as written by HuffmanEncoder.get_packed_bytes.
+# The table of contents ends the archive, with for each file: name length (H), UTF-8 name, container offset (Q),
+# container length (Q), original length (Q) and CRC-32 of the original bytes (I).
+ARCHIVE_MAGIC = b'AHUA'
+ARCHIVE_VERSION = 1
+ARCHIVE_HEADER_STRUCT = struct.Struct('<4sBIQ')
+NAME_LENGTH_STRUCT = struct.Struct('<H')
+MEMBER_STRUCT = struct.Struct('<QQQI')
+
+REPORT_FIELDS = ('name', 'original_bytes', 'encoded_bytes', 'rate_bps', 'entropy_bps', 'encoding_seconds',
+                 'decoding_seconds', 'verified')
+
+
+def collect_files(patterns):
+    ##### Files given directly, matched by a glob or found anywhere under a directory, in a stable order.
+    paths = []
+    for pattern in patterns:
+        for match in sorted(glob.glob(pattern, recursive=True)) or [pattern]:
+            if os.path.isdir(match):
+                paths += sorted(os.path.join(root, name) for root, _, names in os.walk(match) for name in names)
+            elif os.path.isfile(match):
+                paths.append(match)
+            else:
+                raise FileNotFoundError(f"No file matches {match}.")
+    return list(dict.fromkeys(os.path.normpath(path) for path in paths))
+
+
+def get_member_name(path):
+    ##### Names are stored relative to the working directory, with forward slashes.
+    name = os.path.relpath(path).replace(os.sep, '/')
+    if name.startswith('../'):
+        name = os.path.abspath(path).lstrip(os.sep).replace(os.sep, '/')
+    return name
+
+
+def encode_member(path, use_jit=False, context_order=0, entropy_order=0, verify=True):
+    ##### Encode one file with its own tree, as a process pool task.
+    original_bytes = np.fromfile(path, dtype=np.uint8)
+    entropy_statistics = EntropyStatistics(entropy_order)
+    encoding_start = time.perf_counter()
+    encoder = HuffmanEncoder(use_jit=use_jit, context_order=context_order, entropy_statistics=entropy_statistics)
+    encoder.instantiate_bitstream()
+    encoder.read_sequence_array(original_bytes)
+    encoder.encode_with_adaptative_hc(verbose=False)
+    container = encoder.get_packed_bytes()
+    encoding_finish = time.perf_counter()
+
+    ##### Optional round trip, decoding the container right after coding it.
+    decoding_seconds, verified = None, None
+    if verify:
+        decoded_bytes = decode_member(container, use_jit)
+        decoding_seconds = time.perf_counter() - encoding_finish
+        verified = decoded_bytes == original_bytes.tobytes()
+
+    report = {
+        'name': get_member_name(path),
+        'original_bytes': len(original_bytes),
+        'encoded_bytes': len(container),
+        'rate_bps': 8 * len(container) / len(original_bytes) if len(original_bytes) else 0,
+        'entropy_bps': entropy_statistics.get_entropy(entropy_order),
+        'encoding_seconds': encoding_finish - encoding_start,
+        'decoding_seconds': decoding_seconds,
+        'verified': verified,
+    }
+    return container, zlib.crc32(original_bytes), report
+
+
+def decode_member(container, use_jit=False):
+    decoder = HuffmanDecoder(use_jit=use_jit)
+    decoder.read_bitstream(container)
+    decoder.decode_with_adaptative_hc(verbose=False)
+    return bytes(decoder.get_decoded_bytes())
+
+
+def create_archive(paths, archive_path, workers=None, use_jit=False, context_order=0, entropy_order=0, verify=True):
+    ##### Files are coded in a process pool and written in order as soon as they are ready.
+    # NOTE: At most two files per worker are submitted ahead of the oldest one not written yet, so a slow file
+    # holds back a bounded amount of finished containers in memory.
+    window = 2 * (workers or os.cpu_count() or 1)
+    table_of_contents, reports = [], []
+    pending_members = deque()
+    with open(archive_path, "wb") as archive_file, ProcessPoolExecutor(max_workers=workers) as executor:
+        archive_file.write(ARCHIVE_HEADER_STRUCT.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, 0, 0))
+        for index, path in enumerate(paths):
+            pending_members.append(executor.submit(encode_member, path, use_jit, context_order, entropy_order,
+                                                   verify))
+            ##### Write the oldest file once the window is full, then every file left after the last one is submitted.
+            while pending_members and (len(pending_members) >= window or index == len(paths) - 1):
+                container, crc, report = pending_members.popleft().result()
+                table_of_contents.append((report['name'], archive_file.tell(), len(container),
+                                          report['original_bytes'], crc))
+                archive_file.write(container)
+                reports.append(report)
+
+        ##### The table of contents follows the coded files, and the header is rewritten to point to it.
+        table_of_contents_offset = archive_file.tell()
+        for name, *member in table_of_contents:
+            encoded_name = name.encode('utf-8')
+            archive_file.write(NAME_LENGTH_STRUCT.pack(len(encoded_name)) + encoded_name)
+            archive_file.write(MEMBER_STRUCT.pack(*member))
+        archive_file.seek(0)
+        archive_file.write(ARCHIVE_HEADER_STRUCT.pack(ARCHIVE_MAGIC, ARCHIVE_VERSION, len(table_of_contents),
+                                                      table_of_contents_offset))
+    return reports
+
+
+def read_table_of_contents(archive_path):
+    ##### List of (name, container offset, container length, original length, CRC-32) tuples.
+    with open(archive_path, "rb") as archive_file:
+        magic, version, members_amount, table_of_contents_offset = \
+            ARCHIVE_HEADER_STRUCT.unpack(archive_file.read(ARCHIVE_HEADER_STRUCT.size))
+        if magic != ARCHIVE_MAGIC:
+            raise ValueError("The provided file is not an Adaptative Huffman archive.")
+        if version != ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive version: {version}.")
+        archive_file.seek(table_of_contents_offset)
+        table_of_contents = []
+        for _ in range(members_amount):
+            name_length, = NAME_LENGTH_STRUCT.unpack(archive_file.read(NAME_LENGTH_STRUCT.size))
+            name = archive_file.read(name_length).decode('utf-8')
+            table_of_contents.append((name, *MEMBER_STRUCT.unpack(archive_file.read(MEMBER_STRUCT.size))))
+    return table_of_contents
+
+
+def extract_member(archive_path, member, output_directory, use_jit=False):
+    ##### Decode one file, as a process pool task, and check it against its CRC-32.
+    name, offset, length, original_length, crc = member
+    # NOTE: Names come from the archive, so they are never allowed to escape the output directory.
+    # Path components are compared, since names such as '..notes.txt' are valid file names.
+    output_path = os.path.normpath(os.path.join(output_directory, name))
+    relative_path = os.path.relpath(output_path, output_directory)
+    if os.path.isabs(name) or relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        raise ValueError(f"Refusing to extract {name} outside of {output_directory}.")
+    with open(archive_path, "rb") as archive_file:
+        archive_file.seek(offset)
+        decoded_bytes = decode_member(archive_file.read(length), use_jit)
+    if len(decoded_bytes) != original_length or zlib.crc32(decoded_bytes) != crc:
+        raise ValueError(f"Decoded {name} does not match its checksum.")
+
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(output_path, "wb") as decoded_file:
+        decoded_file.write(decoded_bytes)
+    return output_path
+
+
+def extract_archive(archive_path, output_directory, workers=None, use_jit=False):
+    table_of_contents = read_table_of_contents(archive_path)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(extract_member, repeat(archive_path), table_of_contents, repeat(output_directory),
+                                 repeat(use_jit)))
+
+
+def save_report(reports, report_path):
+    ##### CSV for .csv paths, JSON otherwise.
+    with open(report_path, "w", newline='') as report_file:
+        if report_path.endswith('.csv'):
+            report_writer = csv.DictWriter(report_file, fieldnames=REPORT_FIELDS)
+            report_writer.writeheader()
+            report_writer.writerows(reports)
+        else:
+            json.dump(reports, report_file, indent=2)
+
+
+
+if __name__ == "__main__":
+    ##### Receives files and archive from command line.
+    parser = argparse.ArgumentParser(description="Compresses many files into a single archive, coding each one "
+                                                 "with its own tree in a process pool, or extracts an archive.")
+
+    parser.add_argument('--archive', required=True, help="Path of the archive to be created, listed or extracted.")
+    parser.add_argument('--files', required=False, nargs='+', help="Files, directories or glob patterns to be "
+                                                                   "archived. Directories are added recursively.")
+    parser.add_argument('--extract_to', required=False, help="Extract the archive into this directory.")
+    parser.add_argument('--list', action='store_true', help="Print the table of contents of the archive.")
+    parser.add_argument('--workers', required=False, type=int, help="Amount of processes. "
+                                                                    "Defaults to the amount of CPUs.")
+    parser.add_argument('--jit', action='store_true', help="Code with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+    parser.add_argument('--context_order', required=False, type=int, default=0,
+                        help="Code each file with one tree for each context of this many previous symbols.")
+    parser.add_argument('--entropy_order', required=False, type=int, default=0,
+                        help="Order of the conditional entropy reported for each file.")
+    parser.add_argument('--no_verify', action='store_true', help="Skip decoding each file after coding it.")
+    parser.add_argument('--report', required=False, help="Save the report of each file, as CSV if the path ends "
+                                                         "with .csv and as JSON otherwise.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    if args.files:
+        batch_start = time.perf_counter()
+        reports = create_archive(collect_files(args.files), args.archive, args.workers, args.jit, args.context_order,
+                                 args.entropy_order, not args.no_verify)
+        batch_time = time.perf_counter() - batch_start
+        for report in reports:
+            print(f"{report['name']}: {report['original_bytes']} -> {report['encoded_bytes']} bytes, "
+                  f"{report['rate_bps']:.5f} bits per symbol (entropy {report['entropy_bps']:.5f})"
+                  f"{'' if report['verified'] in (None, True) else ', ROUND TRIP FAILED'}.")
+        original_bytes = sum([report['original_bytes'] for report in reports])
+        print(f"Archived {len(reports)} files ({original_bytes} bytes) in {os.path.getsize(args.archive)} bytes "
+              f"and {batch_time:.3f} s.")
+        if args.report is not None:
+            save_report(reports, args.report)
+        if any(report['verified'] is False for report in reports):
+            sys.exit(1)
+
+    if args.list:
+        for name, _, length, original_length, _ in read_table_of_contents(args.archive):
+            print(f"{name}: {original_length} bytes, {length} bytes coded.")
+
+    if args.extract_to is not None:
+        extracted_paths = extract_archive(args.archive, args.extract_to, args.workers, args.jit)
+        print(f"Extracted {len(extracted_paths)} files into {args.extract_to}.")
@@ -0,0 +1,32 @@
+import numpy as np
+
+
+# NOTE: Predictor identifiers, as stored in the container header.
+PREDICTORS = {'none': 0, 'left': 1, 'up': 2}
+
+
+def apply_predictor(plane, predictor):
+    ##### Replace each pixel by its difference to the predicted value, modulo 256.
+    # NOTE: The 'left' predictor uses the pixel above for the first column, and 'up' uses the pixel on the left
+    # for the first row, so only the very first pixel is sent as is.
+    if predictor == PREDICTORS['none']:
+        return plane
+    if predictor == PREDICTORS['up']:
+        return apply_predictor(plane.T, PREDICTORS['left']).T
+
+    residual = plane.copy()
+    residual[:, 1:] = plane[:, 1:] - plane[:, :-1]
+    residual[1:, 0] = plane[1:, 0] - plane[:-1, 0]
+    return residual
+
+
+def revert_predictor(residual, predictor):
+    ##### Cumulative sums of the residuals rebuild the plane, uint8 arithmetic wraps around modulo 256.
+    if predictor == PREDICTORS['none']:
+        return residual
+    if predictor == PREDICTORS['up']:
+        return revert_predictor(residual.T, PREDICTORS['left']).T
+
+    plane = residual.copy()
+    plane[:, 0] = np.cumsum(residual[:, 0], dtype=np.uint8)
+    return np.cumsum(plane, axis=1, dtype=np.uint8)
@@ -0,0 +1,261 @@
+import numpy as np
+
+##### Numba is optional, callers fall back to the pure Python coder without it.
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        return lambda function: function
+
+
+# NOTE: Positions of the scalar tree attributes inside the tree_scalars array.
+ROOT_NODE, NYT_NODE, STRUCTURE_VERSION, TREE_ALGORITHM = 0, 1, 2, 3
+# NOTE: Values of the TREE_ALGORITHM scalar.
+FGK, VITTER = 0, 1
+
+
+def get_tree_arrays(tree):
+    ##### Arrays shared with the kernels, scalar attributes are packed in a small array.
+    tree_scalars = np.array([tree.root_node_number, tree.nyt_node, tree.structure_version,
+                             VITTER if tree.algorithm == 'vitter' else FGK], dtype=np.int64)
+    return (tree.parent, tree.left_child, tree.right_child, tree.weight, tree.symbol, tree.symbol_leaf, tree_scalars)
+
+
+def set_tree_scalars(tree, tree_scalars):
+    tree.nyt_node = int(tree_scalars[NYT_NODE])
+    tree.structure_version = int(tree_scalars[STRUCTURE_VERSION])
+
+
+# NOTE: The kernels below mirror AdaptativeBinaryTree.insert_symbol, so both paths produce the same tree.
+@njit(cache=True)
+def insert_symbol(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars):
+    root_node = tree_scalars[ROOT_NODE]
+    node = symbol_leaf[symbol]
+    ##### NYT node gives birth to a new NYT (left) and to the new symbol leaf (right).
+    if node < 0:
+        node = tree_scalars[NYT_NODE]
+        nyt_node, leaf_node = node - 2, node - 1
+        left_child[node], right_child[node] = nyt_node, leaf_node
+        parent[nyt_node], parent[leaf_node] = node, node
+        symbols[leaf_node] = symbol
+        symbol_leaf[symbol] = leaf_node
+        weight[leaf_node] = 1
+        tree_scalars[NYT_NODE] = nyt_node
+
+    while True:
+        if node != root_node:
+            ##### Binary search for the highest numbered node with the same weight.
+            low, high = node, root_node + 1
+            while low < high:
+                middle = (low + high) // 2
+                if weight[middle] <= weight[node]:
+                    low = middle + 1
+                else:
+                    high = middle
+            block_leader = low - 1
+
+            ##### Swap node contents with the block leader, unless it is the parent.
+            if block_leader != node and block_leader != parent[node]:
+                if left_child[node] >= 0 or left_child[block_leader] >= 0:
+                    tree_scalars[STRUCTURE_VERSION] += 1
+                left_child[node], left_child[block_leader] = left_child[block_leader], left_child[node]
+                right_child[node], right_child[block_leader] = right_child[block_leader], right_child[node]
+                symbols[node], symbols[block_leader] = symbols[block_leader], symbols[node]
+                for moved_node in (node, block_leader):
+                    if left_child[moved_node] >= 0:
+                        parent[left_child[moved_node]] = moved_node
+                        parent[right_child[moved_node]] = moved_node
+                    elif symbols[moved_node] >= 0:
+                        symbol_leaf[symbols[moved_node]] = moved_node
+                node = block_leader
+
+        weight[node] += 1
+        if node == root_node:
+            break
+        node = parent[node]
+
+
+# NOTE: Vitter trees are updated by this kernel instead, mirroring the Vitter walk of AdaptativeBinaryTree.
+@njit(cache=True)
+def insert_symbol_vitter(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars):
+    root_node = tree_scalars[ROOT_NODE]
+    leaf_to_increment = -1
+    node = symbol_leaf[symbol]
+    ##### NYT node gives birth to a new NYT (left) and to the new symbol leaf (right).
+    if node < 0:
+        node = tree_scalars[NYT_NODE]
+        nyt_node, leaf_node = node - 2, node - 1
+        left_child[node], right_child[node] = nyt_node, leaf_node
+        parent[nyt_node], parent[leaf_node] = node, node
+        symbols[leaf_node] = symbol
+        symbol_leaf[symbol] = leaf_node
+        weight[leaf_node] = 1
+        tree_scalars[NYT_NODE] = nyt_node
+    else:
+        ##### Binary search for the highest numbered node with the same weight, then for the last leaf before it.
+        # NOTE: Leaves are ahead of the internal nodes of their weight, so both searches run on sorted ranges.
+        low, high = node, root_node + 1
+        while low < high:
+            middle = (low + high) // 2
+            if weight[middle] <= weight[node]:
+                low = middle + 1
+            else:
+                high = middle
+        low, high = node, low
+        while low < high:
+            middle = (low + high) // 2
+            if left_child[middle] < 0:
+                low = middle + 1
+            else:
+                high = middle
+        leaf_leader = low - 1
+
+        ##### Swap the leaf with the highest numbered leaf of its weight.
+        if leaf_leader != node:
+            symbols[node], symbols[leaf_leader] = symbols[leaf_leader], symbols[node]
+            symbol_leaf[symbols[node]] = node
+            symbol_leaf[symbols[leaf_leader]] = leaf_leader
+            node = leaf_leader
+        ##### The sibling of the NYT node weighs as much as its parent, so it is incremented after it.
+        if node == tree_scalars[NYT_NODE] + 1:
+            leaf_to_increment = node
+            node = parent[node]
+
+    ##### Walk to the root, sliding each node past the block that follows its own, then increment the pending leaf.
+    last_step = False
+    while node >= 0:
+        if node == root_node:
+            weight[node] += 1
+            next_node = -1
+        else:
+            ##### Leaves slide past the internal nodes of their weight, internal nodes past the next weight leaves.
+            # NOTE: Scanning a block costs as much as sliding past it, so no binary search is needed.
+            node_weight = weight[node]
+            is_leaf = left_child[node] < 0
+            former_parent = parent[node]
+            last_node = node
+            while last_node < root_node and weight[last_node + 1] == node_weight:
+                last_node += 1
+            if not is_leaf:
+                while last_node < root_node and weight[last_node + 1] == node_weight + 1 and \
+                      left_child[last_node + 1] < 0:
+                    last_node += 1
+
+            if last_node > node:
+                ##### Move the node contents to last_node, the nodes in between moving one number down.
+                moved_left_child, moved_right_child = left_child[node], right_child[node]
+                moved_symbol, moved_weight = symbols[node], weight[node]
+                for number in range(node, last_node):
+                    left_child[number], right_child[number] = left_child[number + 1], right_child[number + 1]
+                    symbols[number], weight[number] = symbols[number + 1], weight[number + 1]
+                left_child[last_node], right_child[last_node] = moved_left_child, moved_right_child
+                symbols[last_node], weight[last_node] = moved_symbol, moved_weight
+                moved_internal_node = False
+                for number in range(node, last_node + 1):
+                    if left_child[number] >= 0:
+                        parent[left_child[number]] = number
+                        parent[right_child[number]] = number
+                        moved_internal_node = True
+                    elif symbols[number] >= 0:
+                        symbol_leaf[symbols[number]] = number
+                if moved_internal_node:
+                    tree_scalars[STRUCTURE_VERSION] += 1
+                ##### The former parent moved one number down if it was slid past.
+                if node < former_parent <= last_node:
+                    former_parent -= 1
+
+            weight[last_node] += 1
+            next_node = parent[last_node] if is_leaf else former_parent
+
+        if last_step:
+            break
+        node = next_node
+        if node < 0 and leaf_to_increment >= 0:
+            node, last_step = leaf_to_increment, True
+
+
+@njit(cache=True)
+def encode_symbols(source, output, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars):
+    ##### Encode symbols, writing complete bytes to output.
+    # NOTE: Encoding stops early when output may not hold another codeword.
+    # Returns the amount of symbols encoded, of bytes written, of bits emitted, and the pending bits.
+    root_node = tree_scalars[ROOT_NODE]
+    codeword = np.empty(root_node + 8, dtype=np.uint8)
+    margin = (root_node + 8) // 8 + 1
+    pending_bits, pending_length = 0, 0
+    bytes_written, emitted_bits = 0, 0
+
+    encoded_symbols = 0
+    while encoded_symbols < len(source) and bytes_written + margin <= len(output):
+        symbol = source[encoded_symbols]
+        node = symbol_leaf[symbol]
+        ##### New symbols are sent as NYT codeword followed by their 8 bits.
+        codeword_length = 0
+        if node < 0:
+            node = tree_scalars[NYT_NODE]
+            for shift in range(8):
+                codeword[codeword_length] = (symbol >> shift) & 1
+                codeword_length += 1
+        ##### Climb parent links, collecting the codeword from its last bit.
+        while node != root_node:
+            codeword[codeword_length] = 1 if right_child[parent[node]] == node else 0
+            codeword_length += 1
+            node = parent[node]
+
+        for position in range(codeword_length - 1, -1, -1):
+            pending_bits = (pending_bits << 1) | codeword[position]
+            pending_length += 1
+            if pending_length == 8:
+                output[bytes_written] = pending_bits
+                bytes_written += 1
+                pending_bits, pending_length = 0, 0
+        emitted_bits += codeword_length
+
+        if tree_scalars[TREE_ALGORITHM] == VITTER:
+            insert_symbol_vitter(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars)
+        else:
+            insert_symbol(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars)
+        encoded_symbols += 1
+
+    return encoded_symbols, bytes_written, emitted_bits, pending_bits, pending_length
+
+
+@njit(cache=True)
+def decode_symbols(buffer, bit_position, bit_length, output, parent, left_child, right_child, weight, symbols,
+                   symbol_leaf, tree_scalars):
+    ##### Decode up to len(output) symbols, stopping early when the bits run out.
+    # Returns the amount of symbols decoded and the bit position after them.
+    root_node = tree_scalars[ROOT_NODE]
+    decoded_symbols = 0
+    while decoded_symbols < len(output) and bit_position < bit_length:
+        ##### Walk from the root until reaching a leaf.
+        node = root_node
+        while left_child[node] >= 0:
+            if bit_position >= bit_length:
+                raise EOFError("Attempt to read beyond the end of the bitstream.")
+            bit = (buffer[bit_position >> 3] >> (7 - (bit_position & 7))) & 1
+            bit_position += 1
+            node = right_child[node] if bit else left_child[node]
+
+        ##### New symbols are sent with 8 bits after the NYT codeword.
+        if node == tree_scalars[NYT_NODE]:
+            if bit_position + 8 > bit_length:
+                raise EOFError("Attempt to read beyond the end of the bitstream.")
+            symbol = 0
+            for _ in range(8):
+                symbol = (symbol << 1) | ((buffer[bit_position >> 3] >> (7 - (bit_position & 7))) & 1)
+                bit_position += 1
+        else:
+            symbol = symbols[node]
+
+        if tree_scalars[TREE_ALGORITHM] == VITTER:
+            insert_symbol_vitter(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars)
+        else:
+            insert_symbol(symbol, parent, left_child, right_child, weight, symbols, symbol_leaf, tree_scalars)
+        output[decoded_symbols] = symbol
+        decoded_symbols += 1
+
+    return decoded_symbols, bit_position
@@ -0,0 +1,68 @@
+import sys
+import time
+import argparse
+import numpy as np
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+
+
+def measure_coding(byte_array, block_size=None, workers=None):
+    ##### Encode, in a single tree when no block size is given.
+    encoder = HuffmanEncoder()
+    encoder.instantiate_bitstream()
+    encoder.read_sequence_array(byte_array)
+    encoding_start = time.perf_counter()
+    if block_size is None:
+        encoder.encode_with_adaptative_hc(verbose=False)
+    else:
+        encoder.encode_blocks(block_size, workers)
+    encoding_time = time.perf_counter() - encoding_start
+    packed_bytes = encoder.get_packed_bytes()
+
+    ##### Decode and check reconstruction.
+    decoder = HuffmanDecoder(workers=workers)
+    decoder.read_bitstream(packed_bytes)
+    decoding_start = time.perf_counter()
+    decoder.decode_with_adaptative_hc(verbose=False)
+    decoding_time = time.perf_counter() - decoding_start
+    if decoder.get_decoded_bytes() != byte_array.tobytes():
+        raise RuntimeError(f"Decoded source differs from the original one (block size: {block_size}).")
+
+    return 8 * len(packed_bytes) / len(byte_array), encoding_time, decoding_time
+
+
+
+if __name__ == "__main__":
+    ##### Receives file to be measured from command line.
+    parser = argparse.ArgumentParser(description="Compares the rate lost by resetting the tree at each block "
+                                                 "boundary with the speedup of block-parallel coding.")
+
+    parser.add_argument('--file_to_compress', required=True, help='Path to file to be compressed.')
+    parser.add_argument('--block_sizes', required=False, type=int, nargs='+', default=[2**14, 2**16, 2**18],
+                        help="Block sizes, in symbols, to be measured.")
+    parser.add_argument('--workers', required=False, type=int, help="Amount of processes used by the block mode. "
+                                                                    "Defaults to the amount of CPU cores.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    ##### Source is read as raw bytes.
+    byte_array = np.fromfile(args.file_to_compress, dtype=np.uint8)
+
+    ##### Sequential reference.
+    reference_rate, reference_encoding, reference_decoding = measure_coding(byte_array)
+    print(f"\n{'Block size':>12} {'Blocks':>7} {'Rate (bps)':>11} {'Rate cost':>10} "
+          f"{'Enc. time':>10} {'Enc. speedup':>13} {'Dec. time':>10} {'Dec. speedup':>13}")
+    print(f"{'sequential':>12} {1:>7} {reference_rate:>11.5f} {0:>9.2f}% "
+          f"{reference_encoding:>9.2f}s {1:>12.2f}x {reference_decoding:>9.2f}s {1:>12.2f}x")
+
+    ##### Block-parallel coding.
+    for block_size in args.block_sizes:
+        rate, encoding_time, decoding_time = measure_coding(byte_array, block_size, args.workers)
+        blocks_amount = -(-len(byte_array) // block_size)
+        rate_cost = 100 * (rate - reference_rate) / reference_rate
+        print(f"{block_size:>12} {blocks_amount:>7} {rate:>11.5f} {rate_cost:>9.2f}% "
+              f"{encoding_time:>9.2f}s {reference_encoding / encoding_time:>12.2f}x "
+              f"{decoding_time:>9.2f}s {reference_decoding / decoding_time:>12.2f}x")
+    print()
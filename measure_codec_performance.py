@@ -0,0 +1,218 @@
+import sys
+import json
+import time
+import platform
+import argparse
+import numpy as np
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+from imagepredictors import PREDICTORS
+from entropystatistics import calculate_entropy
+
+##### Peak RSS is only available on Unix-like systems.
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+CORPORA = ('text', 'uniform', 'zipf', 'grayscale', 'rgb')
+
+# NOTE: Vocabulary used to build the English-like corpus, sorted from the most to the least frequent word.
+ENGLISH_WORDS = ("the of and to a in is that for it as was with be by on not he this are or his from at which but "
+                 "have an they you were her she there one all we their been has when who will more no if out so "
+                 "said what up its about into than them can only other new some could time these two may then do "
+                 "first any my now such like our over man me even most made after also did many before must "
+                 "through back years where much your way well down should because each just those people how too "
+                 "little state good very make world still own see men work long get here between both life being "
+                 "under never day same another know while last might us great old year off come since against go "
+                 "came right used take three signal compression huffman tree symbol code").split()
+
+
+def generate_corpus(name, size, seed):
+    ##### Deterministic corpora, returned as a flat byte array and the image shape (None for 1-D sources).
+    rng = np.random.default_rng(seed)
+
+    if name == 'text':
+        ranks = np.arange(1, len(ENGLISH_WORDS) + 1)
+        word_probabilities = (1 / ranks) / np.sum(1 / ranks)
+        sentences, length = [], 0
+        while length < size:
+            words = rng.choice(ENGLISH_WORDS, size=rng.integers(4, 16), p=word_probabilities).tolist()
+            if rng.random() < 0.3:
+                words[rng.integers(1, len(words))] += ','
+            sentence = ' '.join(words).capitalize() + ('.\n' if rng.random() < 0.2 else '. ')
+            sentences.append(sentence)
+            length += len(sentence)
+        return np.frombuffer(''.join(sentences).encode('ascii'), dtype=np.uint8)[:size].copy(), None
+
+    if name == 'uniform':
+        return rng.integers(0, 256, size=size, dtype=np.uint8), None
+
+    if name == 'zipf':
+        ranks = np.arange(1, 257)
+        probabilities = ranks ** -1.2 / np.sum(ranks ** -1.2)
+        return rng.permutation(256).astype(np.uint8)[rng.choice(256, size=size, p=probabilities)], None
+
+    ##### Smooth gradients and waves with some noise, as a natural image.
+    channels = 3 if name == 'rgb' else 1
+    side = max(int(np.sqrt(size / channels)), 1)
+    rows, columns = np.mgrid[0:side, 0:side] / side
+    image = np.stack([96 + 64 * np.sin(2 * np.pi * (1.5 + channel) * rows) * np.cos(2 * np.pi * 2.5 * columns)
+                      + 80 * columns + rng.normal(0, 4, (side, side)) for channel in range(channels)], axis=-1)
+    image = np.clip(np.rint(image), 0, 255).astype(np.uint8)
+    if name == 'grayscale':
+        image = image[:, :, 0]
+    elif name != 'rgb':
+        raise ValueError(f"Unknown corpus '{name}'. Available corpora: {', '.join(CORPORA)}.")
+    return image.flatten(), image.shape
+
+
+def get_peak_rss():
+    ##### Peak resident set size of the current process, in bytes.
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # NOTE: Linux reports kilobytes, while macOS reports bytes.
+    return peak_rss if sys.platform == 'darwin' else 1024 * peak_rss
+
+
+def measure_corpus(name, size, seed, repeats=1, use_jit=False, predictor=None, context_order=0):
+    byte_array, shape = generate_corpus(name, size, seed)
+    rss_before_coding = get_peak_rss()
+
+    ##### Best time among the repetitions, since the slower ones only add system noise.
+    encoding_time, decoding_time = float('inf'), float('inf')
+    for _ in range(repeats):
+        encoder = HuffmanEncoder(use_jit=use_jit, context_order=context_order)
+        encoder.instantiate_bitstream()
+        encoder.read_sequence_array(byte_array, shape)
+        encoding_start = time.perf_counter()
+        # NOTE: With a predictor, images are coded in planar mode, one channel per process.
+        if predictor is not None and shape is not None:
+            encoder.encode_channels(predictor)
+        else:
+            encoder.encode_with_adaptative_hc(verbose=False)
+        encoding_time = min(encoding_time, time.perf_counter() - encoding_start)
+        packed_bytes = encoder.get_packed_bytes()
+
+        decoder = HuffmanDecoder(use_jit=use_jit)
+        decoder.read_bitstream(packed_bytes)
+        decoding_start = time.perf_counter()
+        decoder.decode_with_adaptative_hc(verbose=False)
+        decoding_time = min(decoding_time, time.perf_counter() - decoding_start)
+        if decoder.get_decoded_bytes() != byte_array.tobytes():
+            raise RuntimeError(f"Decoded '{name}' corpus differs from the original one.")
+
+    payload_bits = encoder.flushed_bits + encoder.bitstream.get_bit_length()
+    rss_after_coding = get_peak_rss()
+    return {
+        'symbols': len(byte_array),
+        'shape': list(shape) if shape is not None else None,
+        'file_bytes': len(packed_bytes),
+        'entropy_bps': calculate_entropy(np.bincount(byte_array, minlength=256)),
+        'rate_bps': payload_bits / len(byte_array),
+        'encoding_seconds': encoding_time,
+        'decoding_seconds': decoding_time,
+        'encoding_mb_per_s': len(byte_array) / encoding_time / 1e6,
+        'decoding_mb_per_s': len(byte_array) / decoding_time / 1e6,
+        'encoding_ns_per_symbol': 1e9 * encoding_time / len(byte_array),
+        'decoding_ns_per_symbol': 1e9 * decoding_time / len(byte_array),
+        'peak_rss_bytes': rss_after_coding,
+        'coding_rss_bytes': rss_after_coding - rss_before_coding if resource is not None else None,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    ##### Compare throughput and rate with a previous run.
+    regressions = []
+    for name, result in results.items():
+        reference = baseline['results'].get(name)
+        if reference is None or reference['symbols'] != result['symbols']:
+            continue
+        for metric in ('encoding_mb_per_s', 'decoding_mb_per_s'):
+            if result[metric] < (1 - tolerance) * reference[metric]:
+                regressions.append(f"{name}: {metric} dropped from {reference[metric]:.4f} to {result[metric]:.4f}.")
+        # NOTE: Corpora are deterministic, so any rate increase means the coder itself changed.
+        if result['rate_bps'] > reference['rate_bps'] + 1e-9:
+            regressions.append(f"{name}: rate_bps rose from {reference['rate_bps']:.5f} to {result['rate_bps']:.5f}.")
+    return regressions
+
+
+
+if __name__ == "__main__":
+    ##### Receives benchmark parameters from command line.
+    parser = argparse.ArgumentParser(description="Measures throughput, memory and rate of the encoder and decoder "
+                                                 "over deterministic corpora.")
+
+    parser.add_argument('--corpora', required=False, nargs='+', choices=CORPORA, default=list(CORPORA),
+                        help="Corpora to be measured.")
+    parser.add_argument('--size', required=False, type=int, default=2**17, help="Amount of symbols in each corpus.")
+    parser.add_argument('--seed', required=False, type=int, default=0, help="Seed used to generate the corpora.")
+    parser.add_argument('--repeats', required=False, type=int, default=1,
+                        help="Amount of runs for each corpus. The best time is kept.")
+    parser.add_argument('--jit', required=False, action='store_true', help="Measure the Numba-compiled coder.")
+    parser.add_argument('--planar', required=False, choices=list(PREDICTORS),
+                        help="Code the image corpora in planar mode with the given pixel predictor.")
+    parser.add_argument('--context_order', required=False, type=int, default=0,
+                        help="Code with one tree for each context of this many previous symbols.")
+    parser.add_argument('--output', required=False, help="Path to save the results as JSON.")
+    parser.add_argument('--baseline', required=False, help="JSON results of a previous run. "
+                                                           "Exits with an error if throughput regressed.")
+    parser.add_argument('--tolerance', required=False, type=float, default=0.1,
+                        help="Relative throughput drop tolerated before reporting a regression.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    # NOTE: Numba is only imported with --jit, otherwise its import would dominate the peak RSS of every corpus.
+    use_jit = False
+    if args.jit:
+        import jitkernels
+        use_jit = jitkernels.NUMBA_AVAILABLE
+
+    ##### Each corpus is measured in a fresh process, so that the peak RSS is not shared between them.
+    results = {}
+    print(f"\n{'Corpus':>10} {'Symbols':>9} {'Entropy':>8} {'Rate':>8} {'Enc. MB/s':>10} {'Enc. ns/sym':>12} "
+          f"{'Dec. MB/s':>10} {'Dec. ns/sym':>12} {'Peak RSS':>10}")
+    for name in args.corpora:
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+            result = executor.submit(measure_corpus, name, args.size, args.seed, args.repeats, args.jit,
+                                     args.planar, args.context_order).result()
+        results[name] = result
+        peak_rss = f"{result['peak_rss_bytes'] / 2**20:>8.1f}MB" if result['peak_rss_bytes'] is not None else 'n/a'
+        print(f"{name:>10} {result['symbols']:>9} {result['entropy_bps']:>8.4f} {result['rate_bps']:>8.4f} "
+              f"{result['encoding_mb_per_s']:>10.4f} {result['encoding_ns_per_symbol']:>12.0f} "
+              f"{result['decoding_mb_per_s']:>10.4f} {result['decoding_ns_per_symbol']:>12.0f} {peak_rss:>10}")
+    print()
+
+    report = {
+        'parameters': {'size': args.size, 'seed': args.seed, 'repeats': args.repeats,
+                       'jit': use_jit,
+                       'planar': args.planar, 'context_order': args.context_order},
+        'environment': {'python': platform.python_version(), 'numpy': np.__version__,
+                        'machine': platform.machine(), 'system': platform.system()},
+        'results': results,
+    }
+
+    ##### Save results.
+    if args.output is not None:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+    ##### Check regressions against the baseline.
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if any(baseline['parameters'].get(key) != report['parameters'][key] for key in ('jit', 'planar', 'context_order')):
+            print("Warning: the baseline was measured with a different coder (--jit, --planar or --context_order).")
+        regressions = find_regressions(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression - {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions found against the baseline.")
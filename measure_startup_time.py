@@ -0,0 +1,111 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+
+
+# NOTE: Packages that must never be loaded by the core coding path, they are only imported by the features using them.
+HEAVY_MODULES = ('cv2', 'PIL', 'tqdm', 'bitstream', 'pandas', 'scipy', 'numba', 'llvmlite', 'matplotlib')
+
+# NOTE: Imports the codec core and codes a few raw bytes in memory, then lists every top-level module loaded.
+CORE_PATH_SCRIPT = """
+import sys, json
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+encoder = HuffmanEncoder()
+encoder.instantiate_bitstream()
+encoder.read_sequence_array(b'startup time benchmark')
+encoder.encode_with_adaptative_hc(verbose=False)
+decoder = HuffmanDecoder()
+decoder.read_bitstream(encoder.get_packed_bytes())
+decoder.decode_with_adaptative_hc(verbose=False)
+print(json.dumps(sorted(set(module.split('.')[0] for module in sys.modules))))
+"""
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_core_path(python_path):
+    ##### Run the core path in a fresh interpreter, with the import time of every module.
+    completed = subprocess.run([python_path, '-X', 'importtime', '-c', CORE_PATH_SCRIPT], cwd=REPOSITORY_DIRECTORY,
+                               capture_output=True, text=True, check=True)
+    loaded_modules = json.loads(completed.stdout.splitlines()[-1])
+
+    ##### Top-level imports are the lines whose module name is not indented.
+    # NOTE: Lines look like 'import time: <self us> | <cumulative us> | <module>'.
+    import_times = {}
+    for line in completed.stderr.splitlines():
+        fields = line.split('|')
+        if len(fields) == 3 and not fields[2].startswith('  ') and fields[1].strip().isdigit():
+            import_times[fields[2].strip()] = int(fields[1]) / 1e6
+
+    return {
+        'leaked_modules': sorted(set(loaded_modules) & set(HEAVY_MODULES)),
+        'import_seconds': sum(import_times.values()),
+        'slowest_imports': dict(sorted(import_times.items(), key=lambda item: -item[1])[:5]),
+    }
+
+
+def measure_cli(python_path, repeats):
+    ##### Median wall time of encoding and decoding a small file from the command line.
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'source.txt')
+        binary_path = os.path.join(directory, 'source.bin')
+        with open(source_path, "wb") as source:
+            source.write(b'startup time benchmark\n' * 8)
+
+        commands = {
+            'encoder': [python_path, 'huffman_encoder.py', '--file_to_compress', source_path,
+                        '--binary_file_path', binary_path],
+            'decoder': [python_path, 'huffman_decoder.py', '--binary_file', binary_path,
+                        '--decoded_file_path', os.path.join(directory, 'decoded')],
+        }
+        cli_times = {name: [] for name in commands}
+        for _ in range(repeats):
+            for name, command in commands.items():
+                command_start = time.perf_counter()
+                subprocess.run(command, cwd=REPOSITORY_DIRECTORY, capture_output=True, check=True)
+                cli_times[name].append(time.perf_counter() - command_start)
+
+    return {name: float(np.median(times)) for name, times in cli_times.items()}
+
+
+
+if __name__ == "__main__":
+    ##### Receives benchmark parameters from command line.
+    parser = argparse.ArgumentParser(description="Measures the startup time of the coding CLIs and fails if a heavy "
+                                                 "optional dependency is loaded by the core coding path.")
+
+    parser.add_argument('--python_path', required=False, default=sys.executable,
+                        help="Python interpreter used to run the codec.")
+    parser.add_argument('--repeats', required=False, type=int, default=5,
+                        help="Command line runs of each coder, the median time is reported.")
+    parser.add_argument('--max_seconds', required=False, type=float,
+                        help="Also fail if the median run of any coder takes longer than this.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    core_path = measure_core_path(args.python_path)
+    cli_times = measure_cli(args.python_path, args.repeats)
+
+    print(f"Core import time: {core_path['import_seconds'] * 1e3:.1f} ms;")
+    for module, seconds in core_path['slowest_imports'].items():
+        print(f"    {module}: {seconds * 1e3:.1f} ms;")
+    for name, seconds in cli_times.items():
+        print(f"Median {name} run: {seconds * 1e3:.1f} ms;")
+
+    ##### Fail on any heavy import in the core path, or on a slow command line.
+    failures = []
+    if core_path['leaked_modules']:
+        failures.append(f"Heavy modules loaded by the core path: {', '.join(core_path['leaked_modules'])}.")
+    if args.max_seconds is not None:
+        failures += [f"The {name} took {seconds:.3f} s, more than {args.max_seconds} s."
+                     for name, seconds in cli_times.items() if seconds > args.max_seconds]
+    for failure in failures:
+        print(failure)
+    sys.exit(1 if failures else 0)
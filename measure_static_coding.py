@@ -0,0 +1,73 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from huffman_encoder import HuffmanEncoder, CODING_MODES
+from huffman_decoder import HuffmanDecoder
+from measure_codec_performance import CORPORA, generate_corpus
+
+
+def measure_mode(byte_array, mode, use_jit=False, repeats=1):
+    ##### Best encoding and decoding times among the repetitions, with the rate of the whole container.
+    encoding_time, decoding_time = float('inf'), float('inf')
+    for _ in range(repeats):
+        encoder = HuffmanEncoder(use_jit=use_jit, mode=mode)
+        encoder.instantiate_bitstream()
+        encoder.read_sequence_array(byte_array)
+        encoding_start = time.perf_counter()
+        encoder.encode_with_adaptative_hc(verbose=False)
+        encoding_time = min(encoding_time, time.perf_counter() - encoding_start)
+        packed_bytes = encoder.get_packed_bytes()
+
+        decoder = HuffmanDecoder(use_jit=use_jit)
+        decoder.read_bitstream(packed_bytes)
+        decoding_start = time.perf_counter()
+        decoder.decode_with_adaptative_hc(verbose=False)
+        decoding_time = min(decoding_time, time.perf_counter() - decoding_start)
+        if decoder.get_decoded_bytes() != byte_array.tobytes():
+            raise RuntimeError(f"Decoded source differs from the original one ({mode} mode).")
+
+    return {
+        'rate_bps': 8 * len(packed_bytes) / len(byte_array),
+        'encoding_mb_per_s': len(byte_array) / encoding_time / 1e6,
+        'decoding_mb_per_s': len(byte_array) / decoding_time / 1e6,
+    }
+
+
+
+if __name__ == "__main__":
+    ##### Receives inputs to be measured from command line.
+    parser = argparse.ArgumentParser(description="Compares the rate and throughput of the adaptive and static "
+                                                 "modes on the same inputs.")
+
+    parser.add_argument('--files', required=False, nargs='+', default=[], help="Files measured as raw bytes.")
+    parser.add_argument('--corpora', required=False, nargs='*', choices=CORPORA, default=['text', 'zipf', 'uniform'],
+                        help="Generated corpora measured as raw bytes.")
+    parser.add_argument('--size', required=False, type=int, default=2**17, help="Amount of symbols in each corpus.")
+    parser.add_argument('--seed', required=False, type=int, default=0, help="Seed used to generate the corpora.")
+    parser.add_argument('--repeats', required=False, type=int, default=1,
+                        help="Amount of runs for each input and mode. The best time is kept.")
+    parser.add_argument('--jit', action='store_true', help="Code the adaptive mode with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    sources = {name: generate_corpus(name, args.size, args.seed)[0] for name in args.corpora}
+    sources.update({os.path.basename(path): np.fromfile(path, dtype=np.uint8) for path in args.files})
+
+    print(f"\n{'Input':>12} {'Mode':>9} {'Rate (bps)':>11} {'Rate cost':>10} {'Enc. MB/s':>10} {'Enc. speedup':>13} "
+          f"{'Dec. MB/s':>10} {'Dec. speedup':>13}")
+    for name, byte_array in sources.items():
+        results = {mode: measure_mode(byte_array, mode, args.jit, args.repeats) for mode in CODING_MODES}
+        reference = results['adaptive']
+        for mode, result in results.items():
+            rate_cost = 100 * (result['rate_bps'] - reference['rate_bps']) / reference['rate_bps']
+            print(f"{name:>12} {mode:>9} {result['rate_bps']:>11.5f} {rate_cost:>9.2f}% "
+                  f"{result['encoding_mb_per_s']:>10.4f} "
+                  f"{result['encoding_mb_per_s'] / reference['encoding_mb_per_s']:>12.2f}x "
+                  f"{result['decoding_mb_per_s']:>10.4f} "
+                  f"{result['decoding_mb_per_s'] / reference['decoding_mb_per_s']:>12.2f}x")
+    print()
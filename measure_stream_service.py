@@ -0,0 +1,93 @@
+import sys
+import time
+import asyncio
+import argparse
+import numpy as np
+
+from measure_codec_performance import CORPORA, generate_corpus
+from streamcodec import ENCODE_REQUEST, DECODE_REQUEST, start_server, send_request
+
+
+async def measure_connection(data, address, chunk_size):
+    ##### Encode data through the service, then decode the answer and check reconstruction.
+    encoding_start = time.perf_counter()
+    encoded_stream = await send_request(ENCODE_REQUEST, data, chunk_size=chunk_size, **address)
+    decoding_start = time.perf_counter()
+    decoded_data = await send_request(DECODE_REQUEST, encoded_stream, chunk_size=chunk_size, **address)
+    decoding_finish = time.perf_counter()
+    if decoded_data != data:
+        raise RuntimeError("Decoded stream differs from the original one.")
+    return len(encoded_stream), decoding_start - encoding_start, decoding_finish - decoding_start
+
+
+async def measure_service(sources, address, chunk_size):
+    ##### Every source is sent through its own connection, all of them at the same time.
+    measure_start = time.perf_counter()
+    results = await asyncio.gather(*[measure_connection(source, address, chunk_size) for source in sources])
+    elapsed_time = time.perf_counter() - measure_start
+
+    encoded_lengths, encoding_times, decoding_times = map(np.array, zip(*results))
+    total_bytes = sum([len(source) for source in sources])
+    return {
+        'connections': len(sources),
+        'total_bytes': total_bytes,
+        'rate_bps': 8 * np.sum(encoded_lengths) / total_bytes,
+        'aggregate_mb_per_s': 2 * total_bytes / elapsed_time / 1e6,
+        'encoding_seconds': {'mean': np.mean(encoding_times), 'max': np.max(encoding_times)},
+        'decoding_seconds': {'mean': np.mean(decoding_times), 'max': np.max(decoding_times)},
+        'elapsed_seconds': elapsed_time,
+    }
+
+
+async def run_load_test(args):
+    ##### Without an address, a server is started in this process on a free TCP port.
+    server = None
+    address = {'host': args.host, 'port': args.port, 'unix_socket': args.unix_socket}
+    if args.port is None and args.unix_socket is None:
+        server = await start_server('127.0.0.1', 0, chunk_size=args.chunk_size, use_jit=args.jit)
+        address['host'], address['port'] = server.sockets[0].getsockname()[:2]
+
+    sources = [generate_corpus(args.corpus, args.size, args.seed + index)[0].tobytes()
+               for index in range(args.connections)]
+    try:
+        return await measure_service(sources, address, args.chunk_size)
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+
+if __name__ == "__main__":
+    ##### Receives load parameters from command line.
+    parser = argparse.ArgumentParser(description="Measures the aggregate throughput of the compression service "
+                                                 "under many concurrent connections.")
+
+    parser.add_argument('--host', required=False, default='127.0.0.1', help="TCP address of a running service.")
+    parser.add_argument('--port', required=False, type=int, help="TCP port of a running service. If neither a port "
+                                                                 "nor a Unix socket is given, a service is started "
+                                                                 "in this process.")
+    parser.add_argument('--unix_socket', required=False, help="Unix socket path of a running service.")
+    parser.add_argument('--connections', required=False, type=int, default=8,
+                        help="Amount of concurrent connections, each one with its own source.")
+    parser.add_argument('--corpus', required=False, choices=CORPORA[:3], default='text',
+                        help="Generated corpus sent through each connection.")
+    parser.add_argument('--size', required=False, type=int, default=2**16, help="Bytes sent by each connection.")
+    parser.add_argument('--seed', required=False, type=int, default=0, help="Seed of the first generated source.")
+    parser.add_argument('--chunk_size', required=False, type=int, default=2**14,
+                        help="Bytes written to the socket at once, and maximum frame size of the started service.")
+    parser.add_argument('--jit', action='store_true', help="Code with the Numba-compiled kernels in the started "
+                                                           "service, if Numba is installed.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    results = asyncio.run(run_load_test(args))
+    print(f"Connections: {results['connections']} ({results['total_bytes']} bytes in total);")
+    print(f"Rate: {results['rate_bps']:.5f} bits per symbol;")
+    print(f"Encoding time per connection: {results['encoding_seconds']['mean']:.3f} s on average, "
+          f"{results['encoding_seconds']['max']:.3f} s at most;")
+    print(f"Decoding time per connection: {results['decoding_seconds']['mean']:.3f} s on average, "
+          f"{results['decoding_seconds']['max']:.3f} s at most;")
+    print(f"Aggregate throughput: {results['aggregate_mb_per_s']:.3f} MB/s (encoded and decoded bytes) "
+          f"in {results['elapsed_seconds']:.3f} s.")
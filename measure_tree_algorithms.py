@@ -0,0 +1,86 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+from codingstats import CodingStats
+from adaptativebinarytree import TREE_ALGORITHMS
+from measure_codec_performance import CORPORA, generate_corpus
+
+
+def measure_algorithm(byte_array, tree_algorithm, context_order=0, use_jit=False, repeats=1):
+    ##### Best encoding and decoding times among the repetitions, with the rate of the whole container.
+    # NOTE: Tree counters come from a separate encoding run of the Python coder, since the kernels do not count swaps.
+    # Update steps are not reported, both trees take the same amount of them: every step adds one to the weight
+    # of a node, and the final weights of any Huffman tree of the same counts add up to the same total.
+    encoding_time, decoding_time = float('inf'), float('inf')
+    for _ in range(repeats):
+        encoder = HuffmanEncoder(use_jit=use_jit, context_order=context_order, tree_algorithm=tree_algorithm)
+        encoder.instantiate_bitstream()
+        encoder.read_sequence_array(byte_array)
+        encoding_start = time.perf_counter()
+        encoder.encode_with_adaptative_hc(verbose=False)
+        encoding_time = min(encoding_time, time.perf_counter() - encoding_start)
+        packed_bytes = encoder.get_packed_bytes()
+
+        decoder = HuffmanDecoder(use_jit=use_jit)
+        decoder.read_bitstream(packed_bytes)
+        decoding_start = time.perf_counter()
+        decoder.decode_with_adaptative_hc(verbose=False)
+        decoding_time = min(decoding_time, time.perf_counter() - decoding_start)
+        if decoder.get_decoded_bytes() != byte_array.tobytes():
+            raise RuntimeError(f"Decoded source differs from the original one ({tree_algorithm} tree).")
+
+    stats = CodingStats(sample_interval=2**30)
+    encoder = HuffmanEncoder(stats=stats, context_order=context_order, tree_algorithm=tree_algorithm)
+    encoder.instantiate_bitstream()
+    encoder.read_sequence_array(byte_array)
+    encoder.encode_with_adaptative_hc(verbose=False)
+
+    return {
+        'rate_bps': 8 * len(packed_bytes) / len(byte_array),
+        'encoding_symbols_per_s': len(byte_array) / encoding_time,
+        'decoding_symbols_per_s': len(byte_array) / decoding_time,
+        'swaps_per_symbol': stats.swaps / len(byte_array),
+    }
+
+
+
+if __name__ == "__main__":
+    ##### Receives inputs to be measured from command line.
+    parser = argparse.ArgumentParser(description="Compares the rate and throughput of the FGK and Vitter trees "
+                                                 "on the same inputs.")
+
+    parser.add_argument('--files', required=False, nargs='+', default=[], help="Files measured as raw bytes.")
+    parser.add_argument('--corpora', required=False, nargs='*', choices=CORPORA, default=['text', 'zipf', 'uniform'],
+                        help="Generated corpora measured as raw bytes.")
+    parser.add_argument('--size', required=False, type=int, default=2**16, help="Amount of symbols in each corpus.")
+    parser.add_argument('--seed', required=False, type=int, default=0, help="Seed used to generate the corpora.")
+    parser.add_argument('--context_order', required=False, type=int, default=0,
+                        help="Code with one tree for each context of this many previous symbols.")
+    parser.add_argument('--repeats', required=False, type=int, default=1,
+                        help="Amount of runs for each input and tree. The best time is kept.")
+    parser.add_argument('--jit', action='store_true', help="Code with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    sources = {name: generate_corpus(name, args.size, args.seed)[0] for name in args.corpora}
+    sources.update({os.path.basename(path): np.fromfile(path, dtype=np.uint8) for path in args.files})
+
+    print(f"\n{'Input':>12} {'Tree':>7} {'Rate (bps)':>11} {'Rate gain':>10} {'Enc. sym/s':>11} {'Dec. sym/s':>11} "
+          f"{'Swaps/sym':>10}")
+    for name, byte_array in sources.items():
+        results = {algorithm: measure_algorithm(byte_array, algorithm, args.context_order, args.jit, args.repeats)
+                   for algorithm in TREE_ALGORITHMS}
+        reference = results['fgk']
+        for algorithm, result in results.items():
+            rate_gain = 100 * (reference['rate_bps'] - result['rate_bps']) / reference['rate_bps']
+            print(f"{name:>12} {algorithm:>7} {result['rate_bps']:>11.5f} {rate_gain:>9.2f}% "
+                  f"{result['encoding_symbols_per_s']:>11.0f} {result['decoding_symbols_per_s']:>11.0f} "
+                  f"{result['swaps_per_symbol']:>10.3f}")
+    print()
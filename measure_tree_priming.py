@@ -0,0 +1,76 @@
+import sys
+import time
+import argparse
+import tempfile
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+from measure_codec_performance import CORPORA, generate_corpus
+from treesnapshots import train_snapshot, save_snapshot
+
+
+def measure_messages(messages, snapshot_id=None, snapshot_directory=None):
+    ##### Encode and decode each message on its own, as a short message service would.
+    encoded_bytes, encoding_time, decoding_time = 0, 0, 0
+    for message in messages:
+        encoding_start = time.perf_counter()
+        encoder = HuffmanEncoder(snapshot_id=snapshot_id, snapshot_directory=snapshot_directory)
+        encoder.instantiate_bitstream()
+        encoder.read_sequence_array(message)
+        encoder.encode_with_adaptative_hc(verbose=False)
+        packed_bytes = encoder.get_packed_bytes()
+        decoding_start = time.perf_counter()
+
+        decoder = HuffmanDecoder(snapshot_directory=snapshot_directory)
+        decoder.read_bitstream(packed_bytes)
+        decoder.decode_with_adaptative_hc(verbose=False)
+        decoding_finish = time.perf_counter()
+        if decoder.get_decoded_bytes() != message.tobytes():
+            raise RuntimeError("Decoded message differs from the original one.")
+
+        encoded_bytes += len(packed_bytes)
+        encoding_time += decoding_start - encoding_start
+        decoding_time += decoding_finish - decoding_start
+
+    return {
+        'rate_bps': 8 * encoded_bytes / sum([len(message) for message in messages]),
+        'bytes_per_message': encoded_bytes / len(messages),
+        'encoding_us_per_message': 1e6 * encoding_time / len(messages),
+        'decoding_us_per_message': 1e6 * decoding_time / len(messages),
+    }
+
+
+
+if __name__ == "__main__":
+    ##### Receives corpus and message parameters from command line.
+    parser = argparse.ArgumentParser(description="Compares short messages coded from an empty tree with messages "
+                                                 "coded from a tree primed on a sample of the same corpus.")
+
+    parser.add_argument('--corpus', required=False, choices=CORPORA[:3], default='text',
+                        help="Generated corpus, split in a training sample and messages.")
+    parser.add_argument('--sample_size', required=False, type=int, default=2**16,
+                        help="Amount of symbols the snapshot is trained on.")
+    parser.add_argument('--message_size', required=False, type=int, default=256, help="Symbols in each message.")
+    parser.add_argument('--messages', required=False, type=int, default=64, help="Amount of coded messages.")
+    parser.add_argument('--total_weight', required=False, type=int, default=2**10,
+                        help="Sum the trained counts are scaled down to.")
+    parser.add_argument('--seed', required=False, type=int, default=0, help="Seed of the generated corpus.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    ##### Messages follow the training sample, so they are never part of it.
+    corpus, _ = generate_corpus(args.corpus, args.sample_size + args.messages * args.message_size, args.seed)
+    sample, messages = corpus[:args.sample_size], corpus[args.sample_size:]
+    messages = [messages[start:start + args.message_size] for start in range(0, len(messages), args.message_size)]
+
+    with tempfile.TemporaryDirectory() as snapshot_directory:
+        snapshot_id = save_snapshot(train_snapshot(sample, total_weight=args.total_weight),
+                                    snapshot_directory=snapshot_directory)
+        results = {'empty tree': measure_messages(messages),
+                   f'snapshot {snapshot_id:08x}': measure_messages(messages, snapshot_id, snapshot_directory)}
+
+    for name, result in results.items():
+        print(f"{name}: {result['rate_bps']:.5f} bits per symbol, {result['bytes_per_message']:.1f} bytes, "
+              f"{result['encoding_us_per_message']:.0f} us to encode and {result['decoding_us_per_message']:.0f} us "
+              f"to decode per message.")
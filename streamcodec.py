@@ -0,0 +1,194 @@
+import os
+import sys
+import stat
+import struct
+import asyncio
+import argparse
+import numpy as np
+
+from huffman_encoder import HuffmanEncoder
+from huffman_decoder import HuffmanDecoder
+from treesnapshots import DEFAULT_SNAPSHOT_DIRECTORY
+from adaptativebinarytree import TREE_ALGORITHMS
+
+
+# NOTE: Stream layout (little-endian): magic (4s), version (B), flags (B), context order (B), maximum amount of
+# context trees (I), rescale interval (I), maximum root weight (I) and tree snapshot identifier (I), zero when unused.
+# Frames follow, each one with its amount of symbols (I) and payload length in bytes (I) before the payload.
+# A frame without symbols ends the stream.
+STREAM_MAGIC = b'AHUS'
+STREAM_VERSION = 2
+STREAM_HEADER_STRUCT = struct.Struct('<4sBBBIIII')
+FRAME_STRUCT = struct.Struct('<II')
+SNAPSHOT_FLAG = 0x01
+VITTER_FLAG = 0x02
+
+# NOTE: First byte sent by clients of the compression service, selecting the operation of the connection.
+ENCODE_REQUEST = b'E'
+DECODE_REQUEST = b'D'
+
+
+async def encode_stream(reader, writer, chunk_size=2**16, use_jit=False, context_order=0, context_memory=2**26,
+                        rescale_interval=None, max_weight=None, snapshot_id=None,
+                        snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY, tree_algorithm='fgk'):
+    ##### Encode every byte read from reader into frames, until the end of the stream.
+    # NOTE: Each read is coded as a frame and flushed right away, so data sent in bursts is never held back.
+    # Frames are coded in a worker thread, keeping the event loop free for other connections.
+    encoder = HuffmanEncoder(use_jit=use_jit, context_order=context_order, context_memory=context_memory,
+                             rescale_interval=rescale_interval, max_weight=max_weight, snapshot_id=snapshot_id,
+                             snapshot_directory=snapshot_directory, tree_algorithm=tree_algorithm)
+    encoder.start_chunked_encoding()
+    flags = (SNAPSHOT_FLAG if snapshot_id is not None else 0) | (VITTER_FLAG if tree_algorithm == 'vitter' else 0)
+    writer.write(STREAM_HEADER_STRUCT.pack(STREAM_MAGIC, STREAM_VERSION, flags, context_order,
+                                           encoder.max_context_trees if context_order else 0,
+                                           rescale_interval or 0, max_weight or 0, snapshot_id or 0))
+
+    while True:
+        chunk = await reader.read(chunk_size)
+        if not chunk:
+            break
+        frame = await asyncio.to_thread(encoder.encode_frame, np.frombuffer(chunk, dtype=np.uint8))
+        writer.write(FRAME_STRUCT.pack(len(chunk), len(frame)))
+        writer.write(frame)
+        await writer.drain()
+
+    writer.write(FRAME_STRUCT.pack(0, 0))
+    await writer.drain()
+    return encoder.header.original_length
+
+
+async def decode_stream(reader, writer, use_jit=False, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY):
+    ##### Decode frames read from reader, writing the symbols of each frame as soon as it is complete.
+    magic, version, flags, context_order, max_context_trees, rescale_interval, max_weight, snapshot_id = \
+        STREAM_HEADER_STRUCT.unpack(await reader.readexactly(STREAM_HEADER_STRUCT.size))
+    if magic != STREAM_MAGIC:
+        raise ValueError("The provided stream is not an Adaptative Huffman stream.")
+    if version != STREAM_VERSION:
+        raise ValueError(f"Unsupported stream version {version}.")
+
+    decoder = HuffmanDecoder(use_jit=use_jit, context_order=context_order, max_context_trees=max_context_trees,
+                             rescale_interval=rescale_interval or None, max_weight=max_weight or None,
+                             snapshot_id=snapshot_id if flags & SNAPSHOT_FLAG else None,
+                             snapshot_directory=snapshot_directory,
+                             tree_algorithm='vitter' if flags & VITTER_FLAG else 'fgk')
+    decoded_symbols = 0
+    while True:
+        symbols_amount, payload_length = FRAME_STRUCT.unpack(await reader.readexactly(FRAME_STRUCT.size))
+        if symbols_amount == 0:
+            break
+        payload = await reader.readexactly(payload_length)
+        writer.write(await asyncio.to_thread(decoder.decode_frame, payload, symbols_amount))
+        await writer.drain()
+        decoded_symbols += symbols_amount
+    return decoded_symbols
+
+
+async def handle_connection(reader, writer, chunk_size=2**16, use_jit=False,
+                            snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY, **encoder_options):
+    ##### Each connection gets its own coder, so trees are never shared between clients.
+    # NOTE: Encoding goes on until the client closes its side of the connection, decoding until the final frame.
+    try:
+        operation = await reader.readexactly(1)
+        if operation == ENCODE_REQUEST:
+            await encode_stream(reader, writer, chunk_size, use_jit, snapshot_directory=snapshot_directory,
+                                **encoder_options)
+        elif operation == DECODE_REQUEST:
+            await decode_stream(reader, writer, use_jit, snapshot_directory)
+        else:
+            raise ValueError(f"Unknown operation {operation!r}.")
+    except (asyncio.IncompleteReadError, ConnectionError, ValueError) as error:
+        print(f"Connection dropped: {error}", file=sys.stderr)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def start_server(host=None, port=None, unix_socket=None, **connection_options):
+    ##### Serve on a Unix socket when a path is given, otherwise on TCP.
+    async def handle(reader, writer):
+        await handle_connection(reader, writer, **connection_options)
+
+    if unix_socket is not None:
+        return await asyncio.start_unix_server(handle, path=unix_socket)
+    return await asyncio.start_server(handle, host, port)
+
+
+async def open_connection(host=None, port=None, unix_socket=None):
+    if unix_socket is not None:
+        return await asyncio.open_unix_connection(unix_socket)
+    return await asyncio.open_connection(host, port)
+
+
+async def send_request(operation, data, host=None, port=None, unix_socket=None, chunk_size=2**16):
+    ##### Send data to the service and collect its answer, both at the same time to avoid filling socket buffers.
+    reader, writer = await open_connection(host, port, unix_socket)
+
+    async def send_data():
+        writer.write(operation)
+        for start in range(0, len(data), chunk_size):
+            writer.write(data[start:start + chunk_size])
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    answer, _ = await asyncio.gather(reader.read(), send_data())
+    writer.close()
+    await writer.wait_closed()
+    return answer
+
+
+async def serve_forever(args):
+    server = await start_server(args.host, args.port, args.unix_socket, chunk_size=args.chunk_size, use_jit=args.jit,
+                                context_order=args.context_order, context_memory=int(args.context_memory * 2**20),
+                                rescale_interval=args.rescale_interval, max_weight=args.max_weight,
+                                snapshot_id=args.snapshot, snapshot_directory=args.snapshot_directory,
+                                tree_algorithm=args.tree)
+    addresses = ', '.join([str(socket.getsockname()) for socket in server.sockets])
+    print(f"Serving on {addresses}.")
+    async with server:
+        await server.serve_forever()
+
+
+
+if __name__ == "__main__":
+    ##### Receives service address and coding options from command line.
+    parser = argparse.ArgumentParser(description="Local compression service. Clients send 'E' followed by raw bytes "
+                                                 "to be encoded, or 'D' followed by an encoded stream.")
+
+    parser.add_argument('--host', required=False, default='127.0.0.1', help="TCP address to listen on.")
+    parser.add_argument('--port', required=False, type=int, default=8765, help="TCP port to listen on.")
+    parser.add_argument('--unix_socket', required=False, help="Listen on this Unix socket path instead of TCP.")
+    parser.add_argument('--chunk_size', required=False, type=int, default=2**16,
+                        help="Maximum amount of bytes coded in each frame.")
+    parser.add_argument('--jit', action='store_true', help="Code with the Numba-compiled kernels, "
+                                                           "if Numba is installed.")
+    parser.add_argument('--context_order', required=False, type=int, default=0,
+                        help="Code each symbol with a tree selected by this many previous symbols.")
+    parser.add_argument('--context_memory', required=False, type=float, default=64,
+                        help="Memory budget for the context trees of each connection, in MB.")
+    parser.add_argument('--rescale_interval', required=False, type=int,
+                        help="Halve the tree weights every this many symbols.")
+    parser.add_argument('--max_weight', required=False, type=int,
+                        help="Halve the tree weights whenever the root weight reaches this value.")
+    parser.add_argument('--snapshot', required=False, type=lambda value: int(value, 16),
+                        help="Identifier (hexadecimal) of the tree snapshot every encoded stream starts from.")
+    parser.add_argument('--snapshot_directory', required=False, default=DEFAULT_SNAPSHOT_DIRECTORY,
+                        help="Directory holding the tree snapshots.")
+    parser.add_argument('--tree', required=False, choices=TREE_ALGORITHMS, default='fgk',
+                        help="Update algorithm of the trees of every encoded stream.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    ##### A socket file left by a previous run would make the server fail to start.
+    if args.unix_socket is not None and os.path.exists(args.unix_socket) and \
+       stat.S_ISSOCK(os.stat(args.unix_socket).st_mode):
+        os.remove(args.unix_socket)
+
+    try:
+        asyncio.run(serve_forever(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,95 @@
+import os
+import sys
+import zlib
+import struct
+import argparse
+import numpy as np
+
+from adaptativebinarytree import AdaptativeBinaryTree
+
+
+# NOTE: Snapshot file layout (little-endian): magic (4s), version (B), amount of symbols (I),
+# then a tree state as written by AdaptativeBinaryTree.serialize_state.
+SNAPSHOT_MAGIC = b'AHTS'
+SNAPSHOT_VERSION = 1
+SNAPSHOT_STRUCT = struct.Struct('<4sBI')
+SNAPSHOT_EXTENSION = '.snapshot'
+DEFAULT_SNAPSHOT_DIRECTORY = 'snapshots'
+
+##### Snapshots already read by this process, keyed by their directory and identifier.
+# NOTE: Snapshots are immutable, since their identifier is computed from their content.
+LOADED_SNAPSHOTS = {}
+
+
+def get_snapshot_id(symbols_amount, tree_state):
+    ##### 32-bit identifier of a snapshot, stored in the header of the binary files primed with it.
+    return zlib.crc32(tree_state, zlib.crc32(struct.pack('<I', symbols_amount)))
+
+
+def get_snapshot_path(snapshot_id, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY):
+    return os.path.join(snapshot_directory, f'{snapshot_id:08x}{SNAPSHOT_EXTENSION}')
+
+
+def train_snapshot(sample, symbols_amount=2**8, total_weight=None):
+    ##### Tree state holding the symbol counts of the sample, as a starting point for similar sources.
+    # NOTE: With total_weight, counts are scaled down to about this sum, so the primed tree still adapts to
+    # each source. Symbols seen in the sample keep a weight of at least one.
+    symbol_weights = np.bincount(np.asarray(sample).reshape(-1), minlength=symbols_amount)
+    if total_weight is not None and np.sum(symbol_weights) > total_weight:
+        scaled_weights = np.maximum(symbol_weights * total_weight // np.sum(symbol_weights), 1)
+        symbol_weights = np.where(symbol_weights > 0, scaled_weights, 0)
+    tree = AdaptativeBinaryTree(symbols_amount)
+    tree.set_symbol_weights(symbol_weights)
+    return tree.serialize_state()
+
+
+def save_snapshot(tree_state, symbols_amount=2**8, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY):
+    snapshot_id = get_snapshot_id(symbols_amount, tree_state)
+    os.makedirs(snapshot_directory, exist_ok=True)
+    with open(get_snapshot_path(snapshot_id, snapshot_directory), "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_STRUCT.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, symbols_amount) + tree_state)
+    LOADED_SNAPSHOTS[(os.path.abspath(snapshot_directory), snapshot_id)] = (symbols_amount, tree_state)
+    return snapshot_id
+
+
+def load_snapshot(snapshot_id, symbols_amount=2**8, snapshot_directory=DEFAULT_SNAPSHOT_DIRECTORY):
+    ##### Read each snapshot once per process, later requests are served from memory.
+    key = (os.path.abspath(snapshot_directory), snapshot_id)
+    if key not in LOADED_SNAPSHOTS:
+        with open(get_snapshot_path(snapshot_id, snapshot_directory), "rb") as snapshot_file:
+            snapshot = snapshot_file.read()
+        magic, version, snapshot_symbols = SNAPSHOT_STRUCT.unpack_from(snapshot)
+        tree_state = snapshot[SNAPSHOT_STRUCT.size:]
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"Snapshot {snapshot_id:08x} is not a valid tree snapshot.")
+        if get_snapshot_id(snapshot_symbols, tree_state) != snapshot_id:
+            raise ValueError(f"Snapshot {snapshot_id:08x} does not match its identifier.")
+        LOADED_SNAPSHOTS[key] = (snapshot_symbols, tree_state)
+
+    snapshot_symbols, tree_state = LOADED_SNAPSHOTS[key]
+    if snapshot_symbols != symbols_amount:
+        raise ValueError(f"Snapshot {snapshot_id:08x} holds a tree of {snapshot_symbols} symbols, "
+                         f"not {symbols_amount}.")
+    return tree_state
+
+
+
+if __name__ == "__main__":
+    ##### Receives sample files from command line.
+    parser = argparse.ArgumentParser(description="Trains a tree on sample files and saves its snapshot, "
+                                                 "to prime the coding of similar sources.")
+
+    parser.add_argument('--samples', required=True, nargs='+', help="Files coded, as raw bytes, to train the tree.")
+    parser.add_argument('--snapshot_directory', required=False, default=DEFAULT_SNAPSHOT_DIRECTORY,
+                        help="Directory where the snapshot is saved.")
+    parser.add_argument('--total_weight', required=False, type=int,
+                        help="Scale the symbol counts down to about this sum, so that primed trees adapt faster.")
+
+    ##### Read command line
+    args = parser.parse_args(sys.argv[1:])
+
+    sample = np.concatenate([np.fromfile(path, dtype=np.uint8) for path in args.samples])
+    tree_state = train_snapshot(sample, total_weight=args.total_weight)
+    snapshot_id = save_snapshot(tree_state, snapshot_directory=args.snapshot_directory)
+    print(f"Snapshot {snapshot_id:08x} saved in {get_snapshot_path(snapshot_id, args.snapshot_directory)} "
+          f"({len(tree_state)} bytes of tree state, trained on {len(sample)} symbols).")